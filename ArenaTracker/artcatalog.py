@@ -0,0 +1,163 @@
+"""Prebuilt art-fingerprint catalog: packed hashes plus a card table, memory-mapped at lookup.
+
+Build it once from a directory of card images named by Scryfall id or by card name:
+    python artcatalog.py IMAGE_DIR [--out PATH]
+"""
+import json, mmap, os, struct, tempfile, threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from artindex import nearest_packed
+from fingerprint import ALGOS
+from config import ART_CATALOG_PATH
+
+MAGIC = b"ATAC"
+VERSION = 1
+# magic, version, number of hash arrays, entries; followed by one uint64 array per ALGOS
+# entry, n + 1 uint64 record offsets and the UTF-8 JSON records they point into.
+HEADER = struct.Struct("<4sHHQ")
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+BUILD_BATCH = 256
+
+
+class ArtCatalog:
+    """Read-only view of a catalog file; nothing is parsed until a record is hit."""
+
+    def __init__(self, path: Path = ART_CATALOG_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_algos, n = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or n_algos != len(ALGOS):
+            self._mm.close()
+            raise ValueError(f"{path} is not a version {VERSION} art catalog")
+        self._n = n
+        off = HEADER.size
+        self._hashes: Dict[str, np.ndarray] = {}
+        for algo in ALGOS:
+            self._hashes[algo] = np.frombuffer(self._mm, dtype=np.uint64, count=n, offset=off)
+            off += 8 * n
+        self._offsets = np.frombuffer(self._mm, dtype=np.uint64, count=n + 1, offset=off)
+        self._records = off + 8 * (n + 1)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def info(self, i: int) -> Dict:
+        lo, hi = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(self._mm[self._records + lo : self._records + hi])
+
+    def nearest_many(
+        self, hashes: Sequence[Union[str, int]], max_dist: int, algo: str
+    ) -> List[Optional[Tuple[Dict, int]]]:
+        found = nearest_packed(self._hashes[algo], hashes, max_dist)
+        return [(self.info(f[0]), f[1]) if f else None for f in found]
+
+    def close(self):
+        self._hashes.clear()
+        self._offsets = None
+        self._mm.close()
+
+
+def write_catalog(path: Path, hashes: Dict[str, np.ndarray], infos: List[Dict]):
+    """Write a catalog atomically: temp file in the same directory, then rename."""
+    records = [json.dumps(info, separators=(",", ":")).encode() for info in infos]
+    offsets = np.zeros(len(records) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(r) for r in records], dtype=np.uint64)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(ALGOS), len(infos)))
+            for algo in ALGOS:
+                f.write(np.ascontiguousarray(hashes[algo], dtype="<u8").tobytes())
+            f.write(offsets.astype("<u8").tobytes())
+            for r in records:
+                f.write(r)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _images(root: Path) -> Iterator[Path]:
+    for p in sorted(root.rglob("*")):
+        if p.suffix.lower() in IMAGE_SUFFIXES:
+            yield p
+
+
+def _card_for(path: Path, cat) -> Optional[Dict]:
+    """Card for an image named `<scryfall id>.<ext>` or `<card name>.<ext>`."""
+    stem = path.stem
+    if cat is None:
+        return {"name": stem, "id": None, "uri": None, "set": None}
+    info = cat.by_id(stem)
+    if info is None:
+        m = cat.match(stem)
+        info = m[0] if m and m[1] >= 100 else None
+    return info
+
+
+def build(image_dir: Path, out: Path = ART_CATALOG_PATH, log=print) -> int:
+    """Fingerprint every card image under `image_dir` and write the catalog; returns entries."""
+    import cv2
+    from catalog import get_catalog
+    from fingerprint import fingerprints
+
+    cat = get_catalog()
+    parts: Dict[str, List[np.ndarray]] = {a: [] for a in ALGOS}
+    infos: List[Dict] = []
+    skipped = 0
+    batch: List[Tuple[np.ndarray, Dict]] = []
+
+    def flush_batch():
+        fps = fingerprints([img for img, _ in batch], ALGOS)
+        for a in ALGOS:
+            parts[a].append(fps[a])
+        infos.extend(info for _, info in batch)
+        batch.clear()
+
+    for path in _images(image_dir):
+        info = _card_for(path, cat)
+        img = cv2.imread(str(path), cv2.IMREAD_COLOR) if info else None
+        if img is None:
+            skipped += 1
+            continue
+        batch.append((img, info))
+        if len(batch) >= BUILD_BATCH:
+            flush_batch()
+    if batch:
+        flush_batch()
+    hashes = {
+        a: np.concatenate(parts[a]) if parts[a] else np.zeros(0, dtype=np.uint64) for a in ALGOS
+    }
+    write_catalog(out, hashes, infos)
+    log(f"Wrote {len(infos)} fingerprints to {out} ({skipped} images skipped)")
+    return len(infos)
+
+
+_catalog: Optional[ArtCatalog] = None
+_loaded = False
+_load_lock = threading.Lock()
+
+
+def get_art_catalog() -> Optional[ArtCatalog]:
+    """Map the prebuilt catalog once per process; None if it has not been built."""
+    global _catalog, _loaded
+    if not _loaded:
+        with _load_lock:
+            if not _loaded:
+                if ART_CATALOG_PATH.exists():
+                    _catalog = ArtCatalog(ART_CATALOG_PATH)
+                _loaded = True
+    return _catalog
+
+
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser(description="Build the art-fingerprint catalog")
+    p.add_argument("image_dir", type=Path)
+    p.add_argument("--out", type=Path, default=ART_CATALOG_PATH)
+    args = p.parse_args()
+    build(args.image_dir, args.out)
@@ -0,0 +1,79 @@
+import numpy as np
+from typing import Optional, Dict, Iterable, List, Sequence, Tuple, Union
+
+_POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# Bound the (queries x entries x 8) temporary of the lookup-table popcount.
+_CHUNK = 1 << 16
+
+
+def popcount64(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return _POP8[x.view(np.uint8)].reshape(*x.shape, 8).sum(-1, dtype=np.uint8)
+
+
+def to_u64(h: Union[str, int]) -> int:
+    return int(h, 16) if isinstance(h, str) else int(h)
+
+
+def nearest_packed(
+    table: np.ndarray, hashes: Sequence[Union[str, int]], max_dist: int
+) -> List[Optional[Tuple[int, int]]]:
+    """(row, distance) of the closest uint64 in `table` for each query, if within max_dist.
+
+    `table` may be any uint64 array, including a view into a memory-mapped file."""
+    n = len(table)
+    if not n or not len(hashes):
+        return [None] * len(hashes)
+    q = np.array([to_u64(h) for h in hashes], dtype=np.uint64)[:, None]
+    best_d = np.full(len(q), 65, dtype=np.int32)
+    best_i = np.zeros(len(q), dtype=np.int64)
+    step = max(1, _CHUNK // len(q))
+    for lo in range(0, n, step):
+        d = popcount64(q ^ table[None, lo : min(n, lo + step)]).astype(np.int32)
+        i = d.argmin(axis=1)
+        di = d[np.arange(len(q)), i]
+        better = di < best_d
+        best_d[better] = di[better]
+        best_i[better] = i[better] + lo
+    return [
+        (i, int(d)) if d <= max_dist else None for i, d in zip(best_i.tolist(), best_d.tolist())
+    ]
+
+
+class ArtIndex:
+    """Packed uint64 art hashes with a vectorized Hamming nearest-neighbour query."""
+
+    def __init__(self, rows: Iterable[Tuple[str, str, str, str]] = ()):
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._infos: List[Dict] = []
+        self._pos: Dict[int, int] = {}
+        for h, name, sid, uri in rows:
+            self.add(h, {"name": name, "id": sid, "uri": uri})
+
+    def __len__(self) -> int:
+        return len(self._infos)
+
+    def add(self, h: Union[str, int], info: Dict):
+        v = to_u64(h)
+        info = {"name": info.get("name"), "id": info.get("id"), "uri": info.get("uri")}
+        i = self._pos.get(v)
+        if i is not None:
+            self._infos[i] = info
+            return
+        n = len(self._infos)
+        if n == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros(n, dtype=np.uint64)])
+        self._hashes[n] = v
+        self._infos.append(info)
+        self._pos[v] = n
+
+    def nearest_many(
+        self, hashes: Sequence[Union[str, int]], max_dist: int
+    ) -> List[Optional[Tuple[Dict, int]]]:
+        """For each query hash, the closest entry and its distance, if within max_dist."""
+        found = nearest_packed(self._hashes[: len(self._infos)], hashes, max_dist)
+        return [(self._infos[f[0]], f[1]) if f else None for f in found]
+
+    def nearest(self, h: Union[str, int], max_dist: int) -> Optional[Tuple[Dict, int]]:
+        return self.nearest_many([h], max_dist)[0]
@@ -0,0 +1,59 @@
+"""Per-page store write cost: one connection per call (old) vs. a batched StoreSession.
+
+Run from the ArenaTracker directory:  python -m benchmarks.bench_store [--pages N]
+"""
+import argparse, tempfile, time
+from pathlib import Path
+
+from store import db, StoreSession, CARD_SQL, COLLECTION_SQL
+
+TILES = 12
+
+
+def _page_rows(page: int):
+    for i in range(TILES):
+        name = f"Card {page:04d}-{i:02d}"
+        info = {"name": name, "id": f"id-{page}-{i}", "uri": f"https://x/{page}/{i}", "set": "tst"}
+        yield name, info
+
+
+def per_call(path: Path, pages: int) -> float:
+    t0 = time.perf_counter()
+    for p in range(pages):
+        for name, info in _page_rows(p):
+            ts = int(time.time())
+            conn = db(path)
+            conn.execute(CARD_SQL, (name.lower(), name, info["id"], info["uri"], info["set"], ts))
+            conn.commit()
+            conn = db(path)
+            conn.execute(COLLECTION_SQL, (name, 1, info["id"], info["uri"], ts))
+            conn.commit()
+            conn.close()
+    return time.perf_counter() - t0
+
+
+def batched(path: Path, pages: int) -> float:
+    t0 = time.perf_counter()
+    with StoreSession(path) as s:
+        for p in range(pages):
+            for name, info in _page_rows(p):
+                s.cache_card_name(name.lower(), info)
+                s.upsert_collection(name, 1, info)
+            s.flush()
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=50)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        old = per_call(Path(d) / "old.sqlite3", args.pages)
+        new = batched(Path(d) / "new.sqlite3", args.pages)
+    print(f"per-call connection: {old / args.pages * 1000:8.2f} ms/page")
+    print(f"batched session:     {new / args.pages * 1000:8.2f} ms/page")
+    print(f"speedup:             {old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
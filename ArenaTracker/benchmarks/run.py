@@ -0,0 +1,175 @@
+"""Per-stage latency, throughput and accuracy on synthetic collection pages.
+
+Run from the ArenaTracker directory:
+    python -m benchmarks.run [--pages N] [--res 1080p,1440p,4k] [--out bench.json]
+
+Results are written as JSON so runs can be diffed for regressions. OCR stages are
+skipped (and reported as such) when the tesseract binary is not installed.
+"""
+import argparse, json, platform, shutil, tempfile, time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+import recognize, store
+from artindex import ArtIndex
+from benchmarks.synth import RESOLUTIONS, render_page, card_records
+from calibrate import _boxes_from_edges, attach_signatures, layout_matches, locate_dot_slots
+from catalog import Catalog, set_catalog
+from fingerprint import fingerprints_hex
+from namecache import NameCache
+from tracing import percentiles
+from config import FINGERPRINT_ALGO, ART_MAX_DIST
+
+ART_INDEX_SIZE = 30000
+
+
+def timed(samples: Dict[str, List[float]], stage: str, fn: Callable, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    samples.setdefault(stage, []).append(time.perf_counter() - t0)
+    return out
+
+
+def _iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    x1, y1 = max(ax, bx), max(ay, by)
+    x2, y2 = min(ax + aw, bx + bw), min(ay + ah, by + bh)
+    if x2 <= x1 or y2 <= y1:
+        return 0.0
+    inter = (x2 - x1) * (y2 - y1)
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def bench_resolution(label: str, size, pages: int, workdir: Path, ocr: bool) -> Dict:
+    width, height = size
+    samples: Dict[str, List[float]] = {}
+    hits = {"names": [0, 0], "owned": [0, 0], "owned_batch": [0, 0], "layout": [0, 0], "art": [0, 0]}
+    store.open_session(workdir / f"{label}.sqlite3")
+    recognize.name_cache = NameCache()
+
+    rng = np.random.default_rng(7)
+    index = ArtIndex()
+    for i, h in enumerate(rng.integers(0, 2**63, size=ART_INDEX_SIZE, dtype=np.int64).tolist()):
+        index.add(h * 2 + 1, {"name": f"filler {i}"})
+
+    rendered = [render_page(width, height, p) for p in range(pages)]
+    for page in rendered:
+        for t, n in zip(page.tiles, page.names):
+            fp = fingerprints_hex([t.rect.crop(page.frame)])[0]
+            index.add(fp[FINGERPRINT_ALGO], {"name": n})
+    tiles = attach_signatures(rendered[0].frame, list(rendered[0].tiles))
+    slots = timed(samples, "locate_dot_slots", locate_dot_slots, rendered[0].frame, tiles)
+
+    page_times = []
+    for page in rendered:
+        frame = page.frame
+        boxes = timed(samples, "detect_card_boxes", _boxes_from_edges, frame)
+        for t in page.tiles:
+            r = (t.rect.x, t.rect.y, t.rect.w, t.rect.h)
+            hits["layout"][0] += any(_iou(r, b) >= 0.55 for b in boxes)
+            hits["layout"][1] += 1
+        timed(samples, "layout_matches", layout_matches, frame, tiles)
+
+        for t, n_owned in zip(page.tiles, page.owned):
+            owned = timed(samples, "count_black_dots", recognize.count_black_dots, t.dots.crop(frame))
+            hits["owned"][0] += owned == n_owned
+            hits["owned"][1] += 1
+        if slots:
+            dots = [t.dots.crop(frame) for t in page.tiles]
+            batch = timed(samples, "count_owned_batch", recognize.count_owned_batch, dots, slots)
+            for owned, n_owned in zip(batch, page.owned):
+                hits["owned_batch"][0] += owned == n_owned
+                hits["owned_batch"][1] += 1
+        for t in page.tiles:
+            t.dot_slots = slots
+
+        crops = timed(samples, "crop_tiles", recognize.crop_tiles, frame, page.tiles)
+        fps = timed(samples, "fingerprint_page", fingerprints_hex, [c.rect for c in crops])
+        queries = [f[FINGERPRINT_ALGO] for f in fps]
+        found = timed(samples, "art_lookup_page", index.nearest_many, queries, ART_MAX_DIST)
+        for hit, n in zip(found, page.names):
+            hits["art"][0] += bool(hit) and hit[0]["name"] == n
+            hits["art"][1] += 1
+
+        infos = [{"name": n, "id": n, "uri": None, "set": "syn"} for n in page.names]
+        s = store.session()
+
+        def write_page():
+            for info, owned in zip(infos, page.owned):
+                s.upsert_collection(info["name"], owned, info)
+                s.cache_card_name(info["name"].lower(), info)
+            s.flush()
+
+        timed(samples, "store_write_page", write_page)
+
+        if ocr:
+            for t in page.tiles[:3]:
+                timed(samples, "ocr_title", recognize.ocr_title, t.title.crop(frame))
+            timed(samples, "ocr_titles_batch", recognize.ocr_titles, [c.title for c in crops])
+            for t in page.tiles[:3]:
+                tile_crops = recognize.crop_tiles(frame, [t])
+                timed(samples, "resolve_tile", recognize.resolve_infos, tile_crops)
+            t0 = time.perf_counter()
+            page_crops = recognize.crop_tiles(frame, page.tiles)
+            results = recognize.recognize_page_cached(page_crops, reuse=False)
+            for (info, owned), n in zip(results, page.names):
+                if info:
+                    store.upsert_collection(info["name"], owned, info)
+                hits["names"][0] += bool(info) and info["name"] == n
+                hits["names"][1] += 1
+            store.flush()
+            page_times.append(time.perf_counter() - t0)
+    store.close_session()
+
+    out = {
+        "size": [width, height],
+        "pages": pages,
+        "stages": {k: percentiles(v) for k, v in samples.items()},
+        "accuracy": {k: (round(a / b, 4) if b else None) for k, (a, b) in hits.items()},
+        "name_cache": recognize.name_cache.stats(),
+    }
+    if page_times:
+        out["stages"]["end_to_end_page"] = percentiles(page_times)
+        out["pages_per_sec"] = round(len(page_times) / sum(page_times), 3)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=5)
+    ap.add_argument("--res", default=",".join(RESOLUTIONS))
+    ap.add_argument("--out", type=Path, default=Path("bench_results.json"))
+    args = ap.parse_args()
+
+    ocr = shutil.which("tesseract") is not None
+    set_catalog(Catalog(card_records()))
+    recognize.SCRYFALL_FALLBACK = False  # benchmarks never touch the network
+    report = {
+        "meta": {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "ocr": ocr,
+            "fingerprint": FINGERPRINT_ALGO,
+            "art_index_size": ART_INDEX_SIZE,
+        },
+        "resolutions": {},
+    }
+    with tempfile.TemporaryDirectory() as d:
+        for label in args.res.split(","):
+            res = bench_resolution(label, RESOLUTIONS[label], args.pages, Path(d), ocr)
+            report["resolutions"][label] = res
+            pps = res.get("pages_per_sec", "n/a")
+            print(f"{label}: {pps} pages/s, accuracy {res['accuracy']}")
+            for stage, st in res["stages"].items():
+                if st.get("n"):
+                    print(f"  {stage:<20} p50 {st['p50_ms']:9.3f} ms  p95 {st['p95_ms']:9.3f} ms")
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Deterministic synthetic Arena collection pages (2x6 grid) with known names and owned counts."""
+import uuid, zlib, cv2, numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from calibrate import Tile, _tile_from_box
+from config import MAX_DOTS
+
+RESOLUTIONS = {"1080p": (1920, 1080), "1440p": (2560, 1440), "4k": (3840, 2160)}
+
+CARD_NAMES = [
+    "Lightning Bolt", "Counterspell", "Llanowar Elves", "Serra Angel", "Shivan Dragon",
+    "Giant Growth", "Dark Ritual", "Swords to Plowshares", "Wrath of God", "Birds of Paradise",
+    "Sol Ring", "Brainstorm", "Thoughtseize", "Fatal Push", "Opt", "Duress", "Negate",
+    "Shock", "Cancel", "Divination", "Naturalize", "Disenchant", "Murder", "Unsummon",
+    "Raging Goblin", "Savannah Lions", "Grizzly Bears", "Hill Giant", "Air Elemental",
+    "Scathe Zombies", "Goblin Guide", "Monastery Swiftspear", "Tarmogoyf", "Snapcaster Mage",
+    "Thragtusk", "Sheoldred, the Apocalypse", "Fable of the Mirror-Breaker", "Teferi, Time Raveler",
+    "Omnath, Locus of Creation", "The Wandering Emperor", "Memory Deluge", "Consider",
+    "Play with Fire", "Esika's Chariot", "Glorybringer", "Elvish Mystic", "Hero's Downfall",
+    "Mana Leak", "Path to Exile", "Doom Blade", "Rampant Growth", "Cultivate", "Kodama's Reach",
+    "Llanowar Visionary", "Archangel Avacyn", "Baneslayer Angel", "Stormbreath Dragon",
+    "Questing Beast", "Bonecrusher Giant", "Lovestruck Beast", "Embercleave",
+]
+
+
+@dataclass
+class SynthPage:
+    frame: np.ndarray
+    tiles: List[Tile]
+    names: List[str]
+    owned: List[int]
+
+
+def card_records() -> List[Dict]:
+    """Scryfall-shaped card objects for CARD_NAMES, to build a Catalog offline."""
+    return [
+        {
+            "name": n,
+            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, n)),
+            "scryfall_uri": f"https://scryfall.com/card/syn/{i}",
+            "set": "syn",
+            "layout": "normal",
+            "lang": "en",
+        }
+        for i, n in enumerate(CARD_NAMES)
+    ]
+
+
+def _art(name: str, w: int, h: int) -> np.ndarray:
+    rng = np.random.default_rng(zlib.crc32(name.encode()))
+    small = rng.integers(0, 256, size=(6, 5, 3), dtype=np.uint8)
+    return cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+
+
+def _fit_text(img, text: str, roi, color=(235, 235, 235)):
+    font = cv2.FONT_HERSHEY_DUPLEX
+    scale = roi.h / 30.0
+    (tw, th), base = cv2.getTextSize(text, font, scale, 1)
+    if tw > roi.w * 0.96:
+        scale *= roi.w * 0.96 / tw
+        (tw, th), base = cv2.getTextSize(text, font, scale, 1)
+    thick = max(1, int(round(scale * 1.2)))
+    org = (roi.x + max(2, (roi.w - tw) // 2), roi.y + (roi.h + th) // 2)
+    cv2.putText(img, text, org, font, scale, color, thick, cv2.LINE_AA)
+
+
+def grid_boxes(width: int, height: int) -> List[Tuple[int, int, int, int]]:
+    """Card rects laid out like Arena's collection view, scaled to the screen."""
+    top, bottom = int(height * 0.18), int(height * 0.9)
+    gap_y = int(height * 0.03)
+    ch = (bottom - top - gap_y) // 2
+    cw = int(ch * 0.72)
+    gap_x = int(width * 0.012)
+    left = (width - (6 * cw + 5 * gap_x)) // 2
+    return [
+        (left + c * (cw + gap_x), top + r * (ch + gap_y), cw, ch) for r in range(2) for c in range(6)
+    ]
+
+
+def render_page(width: int, height: int, page: int, seed: int = 0) -> SynthPage:
+    rng = np.random.default_rng(seed * 100003 + page)
+    frame = np.full((height, width, 3), (28, 22, 18), dtype=np.uint8)
+    names, owned, tiles = [], [], []
+    for i, box in enumerate(grid_boxes(width, height)):
+        x, y, w, h = box
+        name = CARD_NAMES[(page * 12 + i) % len(CARD_NAMES)]
+        count = int(rng.integers(0, MAX_DOTS + 1))
+        t = _tile_from_box(box)
+        cv2.rectangle(frame, (x, y), (x + w - 1, y + h - 1), (200, 190, 170), -1)
+        bw = max(3, w // 40)
+        frame[y + bw : y + h - bw, x + bw : x + w - bw] = _art(name, w - 2 * bw, h - 2 * bw)
+        # Owned-copies pips: filled dark for owned, hollow for missing, on a light strip.
+        d = t.dots
+        frame[d.y : d.y + d.h, d.x : d.x + d.w] = (185, 185, 185)
+        r = max(3, int(d.h * 0.3))
+        for k in range(MAX_DOTS):
+            cx = d.x + int(d.w * (k + 1) / (MAX_DOTS + 1))
+            cy = d.y + d.h // 2
+            if k < count:
+                cv2.circle(frame, (cx, cy), r, (10, 10, 10), -1, cv2.LINE_AA)
+            else:
+                cv2.circle(frame, (cx, cy), r, (120, 120, 120), 1, cv2.LINE_AA)
+        tb = t.title
+        frame[tb.y : tb.y + tb.h, tb.x : tb.x + tb.w] = (30, 30, 30)
+        _fit_text(frame, name, tb)
+        names.append(name)
+        owned.append(count)
+        tiles.append(t)
+    return SynthPage(frame, tiles, names, owned)
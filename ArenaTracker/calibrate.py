@@ -1,11 +1,11 @@
 import json, cv2, numpy as np
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, replace
+from typing import List, Optional
 
 import textwrap
 
 from overlay import show_overlay
-from config import CALIB_PATH
+from config import CALIB_PATH, MAX_DOTS, DETECT_WIDTH, DETECT_LEVELS, CARD_AREA_FRAC
 
 
 @dataclass
@@ -18,58 +18,169 @@ class ROI:
     def crop(self, im):
         return im[self.y : self.y + self.h, self.x : self.x + self.w]
 
+    def shifted(self, dx: int, dy: int) -> "ROI":
+        return ROI(self.x + dx, self.y + dy, self.w, self.h)
+
 
 @dataclass
 class Tile:
     rect: ROI
     title: ROI
     dots: ROI
+    # Border gradient profile recorded at calibration time (see border_signature).
+    sig: Optional[List[float]] = None
+    # Owned-copy pip centres as (fx, fy) fractions of the dots ROI (see locate_dot_slots).
+    dot_slots: Optional[List[List[float]]] = None
 
 
-def _boxes_from_edges(frame):
-    H, W = frame.shape[:2]
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    gray = cv2.GaussianBlur(gray, (5, 5), 0)
-    edges = cv2.Canny(gray, 70, 170)
-    edges = cv2.dilate(edges, cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5)), 1)
+def grid_bbox(tiles: List[Tile], margin: int = 0):
+    """Union (x, y, w, h) of all tile rects, grown by `margin` pixels on each side."""
+    x1 = min(t.rect.x for t in tiles) - margin
+    y1 = min(t.rect.y for t in tiles) - margin
+    x2 = max(t.rect.x + t.rect.w for t in tiles) + margin
+    y2 = max(t.rect.y + t.rect.h for t in tiles) + margin
+    x1, y1 = max(0, x1), max(0, y1)
+    return x1, y1, x2 - x1, y2 - y1
+
+
+def rebase_tiles(tiles: List[Tile], origin) -> List[Tile]:
+    """Tiles in the coordinates of a capture whose top-left corner is `origin` (x, y)."""
+    ox, oy = origin[0], origin[1]
+    return [
+        replace(
+            t,
+            rect=t.rect.shifted(-ox, -oy),
+            title=t.title.shifted(-ox, -oy),
+            dots=t.dots.shifted(-ox, -oy),
+        )
+        for t in tiles
+    ]
+
+
+def _iou_matrix(a, b) -> np.ndarray:
+    """Pairwise IoU of (x, y, w, h) boxes: rows of `a` against rows of `b`."""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)[:, None, :]
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)[None, :, :]
+    iw = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    ih = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def _nms(boxes, iou_max: float = 0.2, limit: int = 12):
+    """Greedy non-maximum suppression, largest boxes first."""
+    if not boxes:
+        return []
+    arr = np.asarray(boxes)
+    arr = arr[np.argsort(-(arr[:, 2] * arr[:, 3]), kind="stable")]
+    iou = _iou_matrix(arr, arr)
+    suppressed = np.zeros(len(arr), dtype=bool)
+    kept = []
+    for i in range(len(arr)):
+        if suppressed[i]:
+            continue
+        kept.append(tuple(int(v) for v in arr[i]))
+        if len(kept) >= limit:
+            break
+        suppressed |= iou[i] >= iou_max
+    return kept
+
+
+def _candidates(gray, scale: float, y_range, frame_area: int):
+    """Card-shaped contours of one pyramid level, in full-resolution coordinates."""
+    k = 5 if gray.shape[1] >= 1600 else 3
+    edges = cv2.Canny(cv2.GaussianBlur(gray, (k, k), 0), 70, 170)
+    edges = cv2.dilate(edges, cv2.getStructuringElement(cv2.MORPH_RECT, (k, k)), 1)
     cnts, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    H = gray.shape[0] / scale
+    lo, hi = CARD_AREA_FRAC[0] * frame_area, CARD_AREA_FRAC[1] * frame_area
     boxes = []
     for c in cnts:
-        x, y, w, h = cv2.boundingRect(c)
-        area = w * h
-        ar = w / (h + 1e-9)
-        if area < 40000 or area > 300000:
+        x, y, w, h = (int(round(v / scale)) for v in cv2.boundingRect(c))
+        if not lo <= w * h <= hi:
             continue
-        if 0.6 < ar < 0.9 and H * 0.12 < y < H * 0.92:
+        if 0.6 < w / (h + 1e-9) < 0.9 and H * y_range[0] < y < H * y_range[1]:
             boxes.append((x, y, w, h))
-    # NMS
-    boxes = sorted(boxes, key=lambda r: r[2] * r[3], reverse=True)
-    kept = []
+    return boxes
+
+
+def _edge_near(profile: np.ndarray, pos: int, pad: int) -> int:
+    """Boundary of the strongest step in a diff profile within `pad` of `pos`."""
+    lo = max(0, pos - pad)
+    seg = profile[lo : pos + pad]
+    return lo + int(np.argmax(seg)) + 1 if seg.size else pos
+
+
+REFINE_SAMPLES = 128  # points read along each side when snapping a box to full-res edges
+
+
+def _gray(a):
+    return cv2.cvtColor(a, cv2.COLOR_BGR2GRAY) if a.ndim == 3 else a
+
 
-    def iou(a, b):
-        ax, ay, aw, ah = a
-        bx, by, bw, bh = b
-        x1 = max(ax, bx)
-        y1 = max(ay, by)
-        x2 = min(ax + aw, bx + bw)
-        y2 = min(ay + ah, by + bh)
-        if x2 <= x1 or y2 <= y1:
-            return 0.0
-        inter = (x2 - x1) * (y2 - y1)
-        union = aw * ah + bw * bh - inter
-        return inter / union
-
-    for b in boxes:
-        if all(iou(b, k) < 0.2 for k in kept):
-            kept.append(b)
-        if len(kept) >= 12:
+def _refine_box(frame, box, pad: int):
+    """Snap each side of a box found at reduced scale to the strongest full-res edge.
+
+    Only strips of +-pad pixels straddling the four sides are read, at REFINE_SAMPLES
+    points along each side, so the cost does not grow with the resolution."""
+    x, y, w, h = box
+    H, W = frame.shape[:2]
+    sy, sx = max(1, h // REFINE_SAMPLES), max(1, w // REFINE_SAMPLES)
+    sides = []
+    for pos in (x, x + w):  # column edge strength along the box height
+        lo = max(0, pos - pad)
+        strip = _gray(np.ascontiguousarray(frame[y : y + h : sy, lo : min(W, pos + pad + 1)]))
+        sides.append((lo, pos, np.abs(np.diff(strip.astype(np.int16), axis=1)).sum(axis=0)))
+    for pos in (y, y + h):  # row edge strength along the box width
+        lo = max(0, pos - pad)
+        strip = _gray(np.ascontiguousarray(frame[lo : min(H, pos + pad + 1), x : x + w : sx]))
+        sides.append((lo, pos, np.abs(np.diff(strip.astype(np.int16), axis=0)).sum(axis=1)))
+    if any(p.size == 0 for _, _, p in sides):
+        return box
+    left, right, top, bottom = (lo + _edge_near(p, pos - lo, pad) for lo, pos, p in sides)
+    if right - left < w * 0.9 or bottom - top < h * 0.9:
+        return box
+    return left, top, right - left, bottom - top
+
+
+def _boxes_from_edges(frame, y_range=(0.12, 0.92)):
+    """Card boxes from a downscaled pyramid; cost is bounded by DETECT_WIDTH, not the display.
+
+    Each level is downscaled in colour and only then converted to grey, so the full
+    frame is never processed. Levels are tried coarse to fine until a full grid is
+    found; the surviving boxes are then snapped to full-resolution edges read from
+    thin strips along their sides."""
+    H, W = frame.shape[:2]
+    best, best_scale = [], 1.0
+    for scale in _pyramid_scales(W):
+        level = frame
+        if scale < 1.0:
+            level = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+        boxes = _nms(_candidates(_gray(level), scale, y_range, H * W))
+        if len(boxes) > len(best):
+            best, best_scale = boxes, scale
+        if len(best) >= 12:
             break
-    return kept
+    if best_scale == 1.0:
+        return best
+    pad = int(np.ceil(3 / best_scale))
+    return [_refine_box(frame, b, pad) for b in best]
 
 
-def detect_card_boxes(frame):
+def _pyramid_scales(width: int) -> List[float]:
+    scales, s = [], min(1.0, DETECT_WIDTH / float(width))
+    while len(scales) < DETECT_LEVELS:
+        scales.append(s)
+        if s >= 1.0:
+            break
+        s = min(1.0, s * 2)
+    return scales
+
+
+def detect_card_boxes(frame, y_range=(0.12, 0.92)):
     """Detect potential card rectangles in the current frame."""
-    return _boxes_from_edges(frame)
+    return _boxes_from_edges(frame, y_range)
 
 
 def _tile_from_box(box) -> Tile:
@@ -96,7 +207,7 @@ def calibrate(frame, preview: bool = False) -> List[Tile]:
         row1 = sorted([b for b in kept if b[1] < split], key=lambda r: r[0])[:6]
         row2 = sorted([b for b in kept if b[1] >= split], key=lambda r: r[0])[:6]
         boxes = row1 + row2
-        return [_tile_from_box(box) for box in boxes]
+        return _finish_calibration(frame, [_tile_from_box(box) for box in boxes])
 
     if preview and kept:
         preview_tiles = [_tile_from_box(b) for b in kept]
@@ -108,7 +219,52 @@ def calibrate(frame, preview: bool = False) -> List[Tile]:
             hold_ms=900,
         )
 
-    return _manual_calibration(frame, preview, detected_count=len(kept))
+    return _finish_calibration(frame, _manual_calibration(frame, preview, detected_count=len(kept)))
+
+
+def _finish_calibration(frame, tiles: List[Tile]) -> List[Tile]:
+    attach_signatures(frame, tiles)
+    slots = locate_dot_slots(frame, tiles)
+    if slots is None:
+        print("Owned-copy pips not found; counting them per tile until a later page shows them.")
+    for t in tiles:
+        t.dot_slots = slots
+    return tiles
+
+
+def locate_dot_slots(frame, tiles: List[Tile]) -> Optional[List[List[float]]]:
+    """Find the owned-copy pip positions shared by all tiles.
+
+    Any small round blob that stands out from the strip, filled (owned) or hollow
+    (missing), votes for a slot. Blob centres from every tile are clustered along x;
+    None unless that yields exactly MAX_DOTS slots, so the caller falls back to
+    contour counting instead of sampling guessed positions."""
+    xs, ys = [], []
+    for t in tiles:
+        crop = t.dots.crop(frame)
+        if crop.size == 0:
+            continue
+        g = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        g = cv2.medianBlur(g, 3)
+        mask = (np.abs(g.astype(np.int16) - int(np.median(g))) > 40).astype(np.uint8) * 255
+        cnts, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        h, w = g.shape
+        for c in cnts:
+            x, y, bw, bh = cv2.boundingRect(c)
+            if bw < 3 or bh < 3 or bh > h or not 0.6 < bw / float(bh) < 1.6:
+                continue
+            xs.append((x + bw / 2.0) / w)
+            ys.append((y + bh / 2.0) / h)
+    if not xs:
+        return None
+    order = np.argsort(xs)
+    xs, ys = np.asarray(xs)[order], np.asarray(ys)[order]
+    groups = np.split(np.arange(len(xs)), np.nonzero(np.diff(xs) > 0.06)[0] + 1)
+    support = max(2, len(tiles) // 6)
+    groups = [g for g in groups if len(g) >= support]
+    if len(groups) != MAX_DOTS:
+        return None
+    return [[round(float(xs[g].mean()), 4), round(float(ys[g].mean()), 4)] for g in groups]
 
 
 def _manual_calibration(frame, preview: bool, detected_count: int) -> List[Tile]:
@@ -280,50 +436,152 @@ def _collect_card_boxes(frame, card_count: int):
     return boxes
 
 
-def save_calibration(tiles: List[Tile]):
-    data = {
+def tiles_to_json(tiles: List[Tile]) -> dict:
+    return {
         "tiles": [
-            {"rect": vars(t.rect), "title": vars(t.title), "dots": vars(t.dots)}
+            {
+                "rect": vars(t.rect),
+                "title": vars(t.title),
+                "dots": vars(t.dots),
+                "sig": t.sig,
+                "dot_slots": t.dot_slots,
+            }
             for t in tiles
         ]
     }
-    CALIB_PATH.write_text(json.dumps(data))
 
 
-def load_calibration() -> List[Tile]:
-    d = json.loads(CALIB_PATH.read_text())
+def tiles_from_json(d: dict) -> List[Tile]:
     toROI = lambda r: ROI(r["x"], r["y"], r["w"], r["h"])
     return [
-        Tile(toROI(t["rect"]), toROI(t["title"]), toROI(t["dots"])) for t in d["tiles"]
+        Tile(
+            toROI(t["rect"]),
+            toROI(t["title"]),
+            toROI(t["dots"]),
+            t.get("sig"),
+            t.get("dot_slots"),
+        )
+        for t in d["tiles"]
     ]
 
 
-def layout_matches(frame, tiles: List[Tile], min_matches: int = 10, iou_threshold: float = 0.55) -> bool:
-    """Check whether the expected 2x6 grid of cards is visible."""
+def save_calibration(tiles: List[Tile]):
+    CALIB_PATH.write_text(json.dumps(tiles_to_json(tiles)))
 
-    boxes = detect_card_boxes(frame)
-    if not boxes:
+
+def load_calibration() -> List[Tile]:
+    return tiles_from_json(json.loads(CALIB_PATH.read_text()))
+
+
+SIG_HALF = 6  # pixels sampled on each side of a card border
+SIG_STEP = 4  # sample every n-th pixel along the border
+SIG_SEGMENTS = 4  # pieces each border is split into, so a partly hidden side shows up
+SIG_SIZE = 4 * SIG_SEGMENTS * 2 * SIG_HALF  # values in one signature
+SIG_MATCH = 0.7  # segment correlation above which a border piece is certainly in place
+SIG_MISMATCH = 0.3  # whole-profile correlation below which a tile certainly is not
+
+
+def border_signature(frame, roi: ROI) -> Optional[np.ndarray]:
+    """Mean gradient magnitude across each card border, per border segment, as one profile.
+
+    Every side is split into SIG_SEGMENTS pieces along its length, so covering part of
+    a border changes its own piece instead of being averaged away over the whole side.
+    Only thin strips straddling the borders are read, a few kilopixels per tile."""
+    k = SIG_HALF
+    x, y, w, h = roi.x, roi.y, roi.w, roi.h
+    H, W = frame.shape[:2]
+    if x - k < 0 or y - k < 0 or x + w + k + 1 > W or y + h + k + 1 > H:
+        return None
+    gray = lambda a: a.mean(axis=2, dtype=np.float32) if a.ndim == 3 else a.astype(np.float32)
+    parts = []
+    for cx in (x, x + w):
+        d = np.abs(np.diff(gray(frame[y : y + h : SIG_STEP, cx - k : cx + k + 1]), axis=1))
+        parts += [seg.mean(axis=0) for seg in np.array_split(d, SIG_SEGMENTS, axis=0)]
+    for cy in (y, y + h):
+        d = np.abs(np.diff(gray(frame[cy - k : cy + k + 1, x : x + w : SIG_STEP]), axis=0))
+        parts += [seg.mean(axis=1) for seg in np.array_split(d, SIG_SEGMENTS, axis=1)]
+    return np.concatenate(parts)
+
+
+def has_signature(t: Tile) -> bool:
+    """Whether the tile carries a signature in the current segmented layout."""
+    return t.sig is not None and len(t.sig) == SIG_SIZE
+
+
+def attach_signatures(frame, tiles: List[Tile]) -> List[Tile]:
+    for t in tiles:
+        s = border_signature(frame, t.rect)
+        t.sig = s.round(3).tolist() if s is not None else None
+    return tiles
+
+
+def _sig_score(a: np.ndarray, b: np.ndarray) -> float:
+    a = a - a.mean()
+    b = b - b.mean()
+    den = float(np.sqrt((a * a).sum() * (b * b).sum()))
+    return float((a * b).sum()) / den if den > 1e-6 else 0.0
+
+
+def _segment_scores(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Correlation of every border segment of two signatures."""
+    a = a.reshape(-1, 2 * SIG_HALF)
+    b = b.reshape(-1, 2 * SIG_HALF)
+    a = a - a.mean(axis=1, keepdims=True)
+    b = b - b.mean(axis=1, keepdims=True)
+    den = np.sqrt((a * a).sum(axis=1) * (b * b).sum(axis=1))
+    return np.where(den > 1e-6, (a * b).sum(axis=1) / np.maximum(den, 1e-6), 0.0)
+
+
+def fast_layout_check(frame, tiles: List[Tile], needed: int) -> Optional[bool]:
+    """Compare border signatures with calibration; None when the answer is uncertain.
+
+    A tile only counts as in place when every segment of every border matches; one
+    that merely dropped somewhere is left to the full detection."""
+    if not tiles or not all(has_signature(t) for t in tiles):
+        return None
+    good = bad = 0
+    for t in tiles:
+        cur = border_signature(frame, t.rect)
+        if cur is None:
+            bad += 1
+            continue
+        ref = np.asarray(t.sig, dtype=np.float32)
+        if _segment_scores(cur, ref).min() >= SIG_MATCH:
+            good += 1
+        elif _sig_score(cur, ref) < SIG_MISMATCH:
+            bad += 1
+    if good >= needed:
+        return True
+    if len(tiles) - bad < needed:
         return False
+    return None
+
+
+def layout_matches(frame, tiles: List[Tile], min_matches: int = 10, iou_threshold: float = 0.55) -> bool:
+    """Check whether the expected 2x6 grid of cards is visible."""
 
-    def rect_iou(a, b):
-        ax, ay, aw, ah = a
-        bx, by, bw, bh = b
-        x1 = max(ax, bx)
-        y1 = max(ay, by)
-        x2 = min(ax + aw, bx + bw)
-        y2 = min(ay + ah, by + bh)
-        if x2 <= x1 or y2 <= y1:
-            return 0.0
-        inter = (x2 - x1) * (y2 - y1)
-        union = aw * ah + bw * bh - inter
-        if union <= 0:
-            return 0.0
-        return inter / union
-
-    matches = 0
-    for tile in tiles:
-        expected = (tile.rect.x, tile.rect.y, tile.rect.w, tile.rect.h)
-        if any(rect_iou(expected, b) >= iou_threshold for b in boxes):
-            matches += 1
     needed = min(len(tiles), max(0, min_matches))
-    return matches >= needed
+    fast = fast_layout_check(frame, tiles, needed)
+    if fast is not None:
+        ok = fast
+    else:
+        # The frame may be a crop around the grid, so don't apply the screen-position filter.
+        boxes = detect_card_boxes(frame, y_range=(0.0, 1.0))
+        if not boxes:
+            return False
+        expected = [(t.rect.x, t.rect.y, t.rect.w, t.rect.h) for t in tiles]
+        matches = int((_iou_matrix(expected, boxes) >= iou_threshold).any(axis=1).sum())
+        ok = matches >= needed
+    if ok:
+        _learn_missing(frame, tiles)
+    return ok
+
+
+def _learn_missing(frame, tiles: List[Tile]):
+    """Fill in what older calibration files lack, from a frame known to show the grid."""
+    if not all(has_signature(t) for t in tiles):
+        attach_signatures(frame, tiles)
+    if any(t.dot_slots is None for t in tiles):
+        slots = locate_dot_slots(frame, tiles)
+        for t in tiles:
+            t.dot_slots = slots
@@ -1,5 +1,21 @@
-import time, numpy as np, mss, pyautogui
-from config import HOVER_DELAY_SEC
+import math, time, numpy as np, mss, pyautogui
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from config import (
+    SETTLE_POLL_SEC,
+    SETTLE_DIFF,
+    SETTLE_STABLE_FRAMES,
+    SETTLE_TIMEOUT_SEC,
+    CAPTURE_MONITOR,
+    HOVER_LEARN_DIFF,
+    HOVER_TITLE_BAND,
+)
+
+Region = Tuple[int, int, int, int]
+FULL_THUMB_STEP = 16  # stride of thumb() over the whole monitor
+
+# Observed settle durations in seconds, per kind ("page", "hover", ...).
+settle_times: Dict[str, List[float]] = defaultdict(list)
 
 
 def bring_front():
@@ -25,18 +41,222 @@ def mouse_safe():
         pass
 
 
-def screenshot() -> np.ndarray:
-    with mss.mss() as sct:
-        mon = sct.monitors[0]
-        img = np.array(sct.grab(mon))[:, :, :3]
-        return img
+class Grabber:
+    """One persistent mss context bound to a monitor.
 
+    Frame coordinates are pixels relative to the monitor's top-left corner. mss takes
+    boxes in the monitor's own units, which on a Retina Mac are points, so regions are
+    converted with the pixels-per-unit scale of a full grab. grab() returns a BGR view
+    into the screenshot's own buffer, so nothing is copied."""
 
-def hover_screenshot(cx: int, cy: int):
-    try:
-        pyautogui.moveTo(cx, cy, duration=0)
-        time.sleep(HOVER_DELAY_SEC)
-        img = screenshot()
-    finally:
+    def __init__(self, monitor: int = CAPTURE_MONITOR):
+        self._sct = mss.mss()
+        self.monitor = dict(self._sct.monitors[monitor])
+        self._scale: Optional[float] = None
+
+    @property
+    def scale(self) -> float:
+        """Pixels per monitor unit (2.0 on a Retina display), measured once."""
+        if self._scale is None:
+            self.grab()
+        return self._scale
+
+    def size(self) -> Tuple[int, int]:
+        """Monitor width and height in pixels."""
+        s = self.scale
+        return int(round(self.monitor["width"] * s)), int(round(self.monitor["height"] * s))
+
+    def grab(self, region: Optional[Region] = None) -> np.ndarray:
+        if region is None:
+            shot = self._sct.grab(self.monitor)
+            self._scale = shot.width / float(self.monitor["width"])
+            return self._bgr(shot)
+        s = self.scale
+        x, y, w, h = region
+        # Whole monitor units covering the pixel region; the exact pixels are cut out below.
+        left, top = int(x // s), int(y // s)
+        right, bottom = math.ceil((x + w) / s), math.ceil((y + h) / s)
+        shot = self._sct.grab(
+            {
+                "left": self.monitor["left"] + left,
+                "top": self.monitor["top"] + top,
+                "width": right - left,
+                "height": bottom - top,
+            }
+        )
+        ox, oy = x - int(round(left * s)), y - int(round(top * s))
+        return self._bgr(shot)[oy : oy + h, ox : ox + w]
+
+    @staticmethod
+    def _bgr(shot) -> np.ndarray:
+        buf = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        return buf[:, :, :3]
+
+    def to_screen(self, x: int, y: int) -> Tuple[int, int]:
+        """Frame pixels to the screen coordinates the mouse is moved in."""
+        s = self.scale
+        return self.monitor["left"] + int(round(x / s)), self.monitor["top"] + int(round(y / s))
+
+    def close(self):
+        self._sct.close()
+
+
+_grabber: Optional[Grabber] = None
+
+
+def grabber() -> Grabber:
+    global _grabber
+    if _grabber is None:
+        _grabber = Grabber()
+    return _grabber
+
+
+def close_grabber():
+    global _grabber
+    if _grabber is not None:
+        _grabber.close()
+        _grabber = None
+
+
+def screenshot(region: Optional[Region] = None) -> np.ndarray:
+    """Whole monitor, or `region` (x, y, w, h) in monitor pixels."""
+    return grabber().grab(region)
+
+
+def thumb(region: Optional[Region] = None, step: int = 4) -> np.ndarray:
+    """Cheap strided grey thumbnail of a region (x, y, w, h) in monitor pixels."""
+    img = screenshot(region)
+    if region is None:
+        step = FULL_THUMB_STEP
+    return img[::step, ::step].mean(axis=2, dtype=np.float32)
+
+
+def wait_settled(
+    region: Optional[Region] = None,
+    baseline: Optional[np.ndarray] = None,
+    timeout: float = SETTLE_TIMEOUT_SEC,
+    kind: str = "page",
+) -> float:
+    """Block until `region` stops changing; returns the seconds waited.
+
+    With a `baseline` thumbnail (taken before a keypress or hover), the region must
+    first differ from it, so a transition that has not started yet is not mistaken
+    for a settled frame."""
+    t0 = time.perf_counter()
+    changed = baseline is None
+    prev = None
+    still = 0
+    while time.perf_counter() - t0 < timeout:
+        cur = thumb(region)
+        if not changed and np.abs(cur - baseline).mean() > SETTLE_DIFF:
+            changed = True
+        if changed and prev is not None and np.abs(cur - prev).mean() <= SETTLE_DIFF:
+            still += 1
+            if still >= SETTLE_STABLE_FRAMES:
+                break
+        else:
+            still = 0
+        prev = cur
+        time.sleep(SETTLE_POLL_SEC)
+    elapsed = time.perf_counter() - t0
+    settle_times[kind].append(elapsed)
+    return elapsed
+
+
+class HoverLocator:
+    """Learns where Arena draws the enlarged preview relative to a hovered tile.
+
+    The first hover over a tile position diffs the whole screen to find the popup; after
+    that only the popup region is watched, and only its title line is captured."""
+
+    def __init__(self):
+        # tile rect (x, y, w, h) -> popup rect in units of the tile's width/height
+        self.offsets: Dict[Region, Tuple[float, float, float, float]] = {}
+
+    def _clamp(self, x: int, y: int, w: int, h: int) -> Region:
+        mw, mh = grabber().size()
+        x, y = min(max(0, x), mw - 1), min(max(0, y), mh - 1)
+        return x, y, max(1, min(w, mw - x)), max(1, min(h, mh - y))
+
+    def popup_region(self, rect: Region) -> Optional[Region]:
+        off = self.offsets.get(rect)
+        if off is None:
+            return None
+        x, y, w, h = rect
+        fx, fy, fw, fh = off
+        return self._clamp(x + int(fx * w), y + int(fy * h), int(fw * w), int(fh * h))
+
+    def learn(self, rect: Region, before: np.ndarray, after: np.ndarray) -> Optional[Region]:
+        """Record the popup as the bounding box of what changed outside the tile."""
+        step = FULL_THUMB_STEP
+        x, y, w, h = rect
+        changed = np.abs(after - before) > HOVER_LEARN_DIFF
+        # The hovered tile itself may be highlighted; ignore it and a small margin.
+        changed[
+            max(0, (y - h // 10) // step) : (y + h + h // 10) // step + 1,
+            max(0, (x - w // 10) // step) : (x + w + w // 10) // step + 1,
+        ] = False
+        ys, xs = np.nonzero(changed)
+        if len(xs) == 0:
+            return None
+        px, py = int(xs.min()) * step, int(ys.min()) * step
+        pw, ph = (int(xs.max()) + 1) * step - px, (int(ys.max()) + 1) * step - py
+        if pw * ph < w * h or not 0.5 < pw / float(ph) < 1.0:
+            return None  # not card-shaped: some other part of the screen changed
+        self.offsets[rect] = ((px - x) / w, (py - y) / h, pw / w, ph / h)
+        return self.popup_region(rect)
+
+    def title_region(self, popup: Region) -> Region:
+        x, y, w, h = popup
+        top, bottom = HOVER_TITLE_BAND
+        return self._clamp(
+            x + int(w * 0.06), y + int(h * top), int(w * 0.78), int(h * (bottom - top))
+        )
+
+    def hover_title(self, rect: Region) -> Optional[np.ndarray]:
+        """Hover the tile and capture the preview's title line; None if no popup was found."""
+        cx, cy = rect[0] + rect[2] // 2, rect[1] + rect[3] // 2
+        popup = self.popup_region(rect)
+        try:
+            if popup is None:
+                before = thumb()
+                pyautogui.moveTo(*grabber().to_screen(cx, cy), duration=0)
+                wait_settled(None, before, kind="hover.learn")
+                popup = self.learn(rect, before, thumb())
+                if popup is None:
+                    return None
+            else:
+                before = thumb(popup)
+                pyautogui.moveTo(*grabber().to_screen(cx, cy), duration=0)
+                wait_settled(popup, before, kind="hover")
+            return screenshot(self.title_region(popup)).copy()
+        finally:
+            mouse_safe()
+
+
+hover_locator = HoverLocator()
+
+
+def hover_title(rect) -> Optional[np.ndarray]:
+    """Title line of the hover preview for a tile ROI in monitor coordinates."""
+    return hover_locator.hover_title((rect.x, rect.y, rect.w, rect.h))
+
+
+class LiveSource:
+    """Frames from the screen; pages are turned with the right-arrow key."""
+
+    def __init__(self, region: Region):
+        self.region = region
+
+    def settle(self, baseline=None) -> Optional[float]:
         mouse_safe()
-    return img
+        return wait_settled(self.region, baseline)
+
+    def grab(self) -> Optional[np.ndarray]:
+        return screenshot(self.region)
+
+    def baseline(self):
+        return thumb(self.region)
+
+    def next_page(self):
+        pyautogui.press("right")
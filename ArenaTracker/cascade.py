@@ -0,0 +1,68 @@
+"""Cost-ordered name resolution: cheap tiers answer first, expensive ones only for unsure tiles."""
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from tracing import span
+
+
+@dataclass
+class Candidate:
+    info: Dict
+    confidence: float  # 0..1; a tile is settled once a candidate reaches Cascade.accept
+    tier: str = ""
+
+
+@dataclass
+class Tier:
+    name: str
+    cost: float  # rough relative cost per tile; tiers run cheapest first
+    # (context, tile indices still unsure) -> candidates for the tiles it could answer
+    resolve: Callable[[Any, List[int]], Dict[int, Optional[Candidate]]]
+
+
+class Cascade:
+    """Runs tiers in cost order over a batch of tiles, stopping per tile at `accept`.
+
+    Tiles no tier is confident about keep their best candidate. Per tier it counts the
+    tiles offered (tried), the ones it had a candidate for (answered) and the ones whose
+    final answer came from it (won)."""
+
+    def __init__(self, tiers: List[Tier], accept: float):
+        self.tiers = sorted(tiers, key=lambda t: t.cost)
+        self.accept = accept
+        self._lock = threading.Lock()
+        self._stats = {t.name: {"tried": 0, "answered": 0, "won": 0} for t in self.tiers}
+
+    def run(self, ctx, n: int, max_cost: Optional[float] = None) -> List[Optional[Candidate]]:
+        """Best candidate per tile; tiers costlier than `max_cost` are skipped."""
+        best: List[Optional[Candidate]] = [None] * n
+        todo = list(range(n))
+        for tier in self.tiers:
+            if not todo or (max_cost is not None and tier.cost > max_cost):
+                break
+            # Own namespace: resolve.* spans time single-title lookups inside the tiers.
+            with span(f"tier.{tier.name}", tiles=len(todo)):
+                found = tier.resolve(ctx, todo)
+            answered = 0
+            for i, cand in found.items():
+                if cand is None:
+                    continue
+                answered += 1
+                cand.tier = tier.name
+                if best[i] is None or cand.confidence > best[i].confidence:
+                    best[i] = cand
+            self._bump(tier.name, tried=len(todo), answered=answered)
+            todo = [i for i in todo if best[i] is None or best[i].confidence < self.accept]
+        for c in best:
+            if c:
+                self._bump(c.tier, won=1)
+        return best
+
+    def _bump(self, name: str, **counts):
+        with self._lock:
+            for k, v in counts.items():
+                self._stats[name][k] += v
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._stats.items()}
@@ -0,0 +1,100 @@
+import json, math, threading
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Optional, Dict, Iterable, List, Tuple
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+from config import BULK_DATA_PATH, FUZZY_NAME_CUTOFF
+
+# Layouts that never show up as collectible cards in the Arena collection view.
+SKIP_LAYOUTS = {"token", "double_faced_token", "emblem", "art_series", "vanguard", "scheme", "planar"}
+
+
+def card_info(card: Dict) -> Dict:
+    return {
+        "name": card.get("name"),
+        "id": card.get("id"),
+        "uri": card.get("scryfall_uri"),
+        "set": card.get("set"),
+    }
+
+
+class Catalog:
+    """Fuzzy card-name index over Scryfall bulk data, resolved fully offline."""
+
+    def __init__(self, cards: Iterable[Dict], cutoff: float = FUZZY_NAME_CUTOFF):
+        self.cutoff = cutoff
+        self._by_key: Dict[str, Dict] = {}
+        self._by_id: Dict[str, Dict] = {}
+        for card in cards:
+            if card.get("layout") in SKIP_LAYOUTS or card.get("lang", "en") != "en":
+                continue
+            info = card_info(card)
+            self._by_id[info["id"]] = info
+            names = [info["name"]] + [f.get("name") for f in card.get("card_faces") or []]
+            for n in names:
+                key = default_process(n or "")
+                if key:
+                    self._by_key.setdefault(key, info)
+        # Sorted by length so a fuzzy query only scores keys whose length can reach the cutoff.
+        self._keys: List[str] = sorted(self._by_key, key=len)
+        self._lens: List[int] = [len(k) for k in self._keys]
+
+    @classmethod
+    def from_bulk_file(cls, path: Path = BULK_DATA_PATH) -> "Catalog":
+        with open(path, "rb") as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def match(self, text: str) -> Optional[Tuple[Dict, float]]:
+        key = default_process(text or "")
+        if not key:
+            return None
+        hit = self._by_key.get(key)
+        if hit:
+            return hit, 100.0
+        # fuzz.ratio >= c implies the other length lies in [n*c/(200-c), n*(200-c)/c].
+        n, c = len(key), self.cutoff
+        lo = bisect_left(self._lens, math.ceil(n * c / (200 - c)))
+        hi = bisect_right(self._lens, math.floor(n * (200 - c) / c))
+        best = process.extractOne(
+            key, self._keys[lo:hi], scorer=fuzz.ratio, processor=None, score_cutoff=c
+        )
+        if not best:
+            return None
+        return self._by_key[best[0]], float(best[1])
+
+    def lookup(self, text: str) -> Optional[Dict]:
+        m = self.match(text)
+        return m[0] if m else None
+
+    def by_id(self, scryfall_id: str) -> Optional[Dict]:
+        return self._by_id.get(scryfall_id)
+
+
+_catalog: Optional[Catalog] = None
+_loaded = False
+_load_lock = threading.Lock()
+
+
+def get_catalog() -> Optional[Catalog]:
+    """Load the bulk-data catalog once per process; None if no bulk file is present.
+
+    Concurrent first callers wait for the load instead of seeing no catalog."""
+    global _catalog, _loaded
+    if not _loaded:
+        with _load_lock:
+            if not _loaded:
+                if BULK_DATA_PATH.exists():
+                    _catalog = Catalog.from_bulk_file(BULK_DATA_PATH)
+                _loaded = True
+    return _catalog
+
+
+def set_catalog(cat: Optional[Catalog]):
+    """Use `cat` instead of the bulk-data file (benchmarks, tests, custom card pools)."""
+    global _catalog, _loaded
+    with _load_lock:
+        _catalog, _loaded = cat, True
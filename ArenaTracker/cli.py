@@ -0,0 +1,224 @@
+"""arena-tracker command line.
+
+Only `scan` and `calibrate` load OpenCV, NumPy and the screen-capture stack, plus
+`cache build-art`, which needs OpenCV and NumPy to fingerprint card images; the other
+commands touch just the SQLite cache and the export files, so they start fast on a
+headless machine.
+"""
+import argparse, json, sys, time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+
+def add_scan_args(s: argparse.ArgumentParser):
+    """Flags shared by `arena-tracker scan` and `python main.py`."""
+    s.add_argument("--recalibrate", action="store_true")
+    s.add_argument("--preview", action="store_true")
+    s.add_argument("--hover-ocr", action="store_true")
+    s.add_argument(
+        "--full-rescan", action="store_true", help="ignore stored page results and re-OCR every tile"
+    )
+    s.add_argument("--record", action="store_true", help="save each page's frame under data/frames/")
+    s.add_argument("--replay", type=Path, help="process a recorded scan instead of the screen")
+    s.add_argument(
+        "--defer",
+        choices=("page", "run"),
+        help="queue name lookups and resolve them in bulk after each page or at the end",
+    )
+
+
+def scan_options(args) -> dict:
+    """main.run keyword arguments from parsed add_scan_args flags."""
+    return dict(
+        recalibrate=args.recalibrate,
+        preview=args.preview,
+        hover_ocr=args.hover_ocr,
+        full_rescan=args.full_rescan,
+        record=args.record,
+        replay=args.replay,
+        defer=args.defer,
+    )
+
+
+def cmd_scan(args):
+    from main import run
+
+    run(**scan_options(args))
+
+
+def cmd_calibrate(args):
+    from main import calibrate_screen, close_log
+
+    try:
+        tiles = calibrate_screen(preview=args.preview, recalibrate=True)
+        print(f"Calibrated {len(tiles)} tiles")
+    finally:
+        close_log()
+
+
+def cmd_export(args):
+    from export import Exporter
+
+    ex = Exporter(args.format) if args.format else Exporter()
+    ex.export(force=True)
+    for p in ex.paths():
+        print(p)
+
+
+def cmd_stats(args):
+    from store import table_counts, runs
+
+    counts = table_counts()
+    print(f"Cards in collection: {counts.get('collection', 0)}")
+    print(f"Owned copies:        {counts.get('collection.copies', 0)}")
+    print(f"Queued lookups:      {counts.get('deferred_name', 0)}")
+    history = runs()
+    print(f"Scan runs:           {len(history)}")
+    if history:
+        rid, started, finished, note, changes = history[-1]
+        print(f"Last run:            #{rid} {_fmt_ts(started)} ({note}), {changes} changes")
+    if args.trace:
+        _trace_summary(args.trace)
+
+
+def _trace_summary(path: Path):
+    from tracing import percentiles
+
+    spans = {}
+    with open(path) as f:
+        for line in f:
+            ev = json.loads(line)
+            spans.setdefault(ev["span"], []).append(ev["ms"] / 1000.0)
+    print(f"{'stage':<22}{'n':>7}{'p50 ms':>11}{'p95 ms':>11}{'max ms':>11}")
+    for name, values in sorted(spans.items()):
+        st = percentiles(values)
+        print(
+            f"{name:<22}{st['n']:>7}{st['p50_ms']:>11.2f}{st['p95_ms']:>11.2f}{st['max_ms']:>11.2f}"
+        )
+
+
+def cmd_query(args):
+    import store
+
+    if args.runs:
+        for rid, started, finished, note, changes in store.runs():
+            print(f"#{rid}\t{_fmt_ts(started)}\t{_fmt_ts(finished)}\t{note or ''}\t{changes}")
+    elif args.diff:
+        for name, before, after in store.diff_runs(*args.diff):
+            print(f"{name}\t{'-' if before is None else before}\t{after}")
+    elif args.as_of:
+        for name, count in store.collection_as_of(_parse_date(args.as_of)):
+            print(f"{name}\t{count}")
+    else:
+        needle = (args.name or "").lower()
+        for name, count, sid, uri in store.collection_rows():
+            if needle in name.lower():
+                print(f"{name}\t{count}\t{uri or ''}")
+
+
+def cmd_cache(args):
+    if args.action == "build-art":
+        if not args.path:
+            sys.exit("cache build-art needs an image directory")
+        from artcatalog import build
+
+        build(args.path)
+        return
+    import store
+
+    if args.action == "info":
+        for table, n in store.table_counts().items():
+            print(f"{table:<22}{n:>9}")
+    elif args.action == "clear-negative":
+        print(f"Forgot {store.purge_negative_names()} rejected OCR strings")
+    elif args.action == "resolve":
+        from deferred import resolve_deferred
+
+        store.begin_run("cache resolve")
+        try:
+            resolved, left = resolve_deferred()
+        finally:
+            store.end_run()
+        print(f"Resolved {resolved} queued titles; {left} still queued")
+
+
+def _fmt_ts(ts: Optional[int]) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) if ts else "-"
+
+
+def _export_formats(text: str) -> List[str]:
+    """argparse type for --format: comma-separated names from export.FORMATS."""
+    from export import FORMATS
+
+    formats = [f.strip() for f in text.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(
+            f"unknown format {', '.join(unknown) or repr(text)}; choose from {', '.join(FORMATS)}"
+        )
+    return formats
+
+
+def _parse_date(text: str) -> float:
+    """End of the given day for a bare date, else the exact ISO timestamp."""
+    dt = datetime.fromisoformat(text)
+    if len(text) <= 10:
+        dt = dt.replace(hour=23, minute=59, second=59)
+    return dt.timestamp()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="arena-tracker")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("scan", help="scan the collection on screen (or a recording)")
+    add_scan_args(s)
+    s.set_defaults(func=cmd_scan)
+
+    s = sub.add_parser("calibrate", help="detect the card grid and save it")
+    s.add_argument("--preview", action="store_true")
+    s.set_defaults(func=cmd_calibrate)
+
+    s = sub.add_parser("export", help="write the collection export files now")
+    s.add_argument(
+        "--format",
+        type=_export_formats,
+        help="comma-separated: csv, jsonl, arena (default: config)",
+    )
+    s.set_defaults(func=cmd_export)
+
+    s = sub.add_parser("stats", help="collection and scan-history summary")
+    s.add_argument("--trace", type=Path, help="also summarize a trace.jsonl file")
+    s.set_defaults(func=cmd_stats)
+
+    s = sub.add_parser("query", help="look up cards, scan runs and collection history")
+    s.add_argument("name", nargs="?", help="substring of card names to list")
+    g = s.add_mutually_exclusive_group()
+    g.add_argument("--runs", action="store_true", help="list scan runs")
+    g.add_argument("--diff", nargs=2, type=int, metavar=("RUN_A", "RUN_B"))
+    g.add_argument("--as-of", metavar="DATE", help="collection as of YYYY-MM-DD[THH:MM]")
+    s.set_defaults(func=cmd_query)
+
+    s = sub.add_parser("cache", help="inspect or maintain the lookup caches")
+    s.add_argument("action", choices=("info", "clear-negative", "resolve", "build-art"))
+    s.add_argument(
+        "path", nargs="?", type=Path, help="image directory for build-art (needs OpenCV and NumPy)"
+    )
+    s.set_defaults(func=cmd_cache)
+    return p
+
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    finally:
+        if args.command != "scan":
+            from store import close_session
+
+            close_session()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # All outputs in a visible folder on Desktop
@@ -5,12 +6,52 @@ BASE_DIR = Path.home() / "Desktop" / "ArenaTracker"
 DATA_DIR = BASE_DIR / "data"
 FRAMES_DIR = DATA_DIR / "frames"
 LOG_PATH = DATA_DIR / "run.log"
+TRACE_PATH = DATA_DIR / "trace.jsonl"
 CSV_PATH = DATA_DIR / "collection.csv"
+JSONL_PATH = DATA_DIR / "collection.jsonl"
+ARENA_PATH = DATA_DIR / "collection-arena.txt"
 DB_PATH = DATA_DIR / "cache.sqlite3"
 CALIB_PATH = DATA_DIR / "calibration.json"
+# Scryfall bulk data (e.g. "Oracle Cards" or "Default Cards") downloaded from https://scryfall.com/docs/api/bulk-data
+BULK_DATA_PATH = DATA_DIR / "scryfall-cards.json"
+# Prebuilt art fingerprints of a local card-image directory (python artcatalog.py IMAGE_DIR)
+ART_CATALOG_PATH = DATA_DIR / "art-catalog.bin"
 
 # Tunables
 FUZZY_NAME_CUTOFF = 80
+SCRYFALL_FALLBACK = True  # query the Scryfall API for names missing from the local catalog
+SCRYFALL_API = "https://api.scryfall.com"
+SCRYFALL_RATE = 10  # requests per second; Scryfall asks for 50-100 ms between requests
+SCRYFALL_TIMEOUT = (3.05, 10)  # connect, read seconds
+SCRYFALL_BREAKER_FAILURES = 3  # consecutive failures before lookups fail fast
+SCRYFALL_BREAKER_COOLDOWN_SEC = 60
+CARD_CACHE_SIZE = 4096  # in-memory LRU entries in front of card_map
+CARD_CACHE_TTL_SEC = 30 * 24 * 3600
+NEGATIVE_CACHE_TTL_SEC = 7 * 24 * 3600  # how long rejected OCR strings are not retried
 MAX_DOTS = 4
-PAGE_SETTLE_SEC = 0.40
-HOVER_DELAY_SEC = 0.25
+DOT_DARK_LEVEL = 60  # mean grey below which a sampled pip slot counts as owned
+ART_MAX_DIST = 5  # Hamming distance for an art-hash match
+FINGERPRINT_ALGO = "phash"  # art matching hash: "ahash", "dhash" or "phash"
+# Card-box detection runs on a pyramid starting at this width, independent of display size
+DETECT_WIDTH = 960
+DETECT_LEVELS = 2  # finer levels tried when the coarsest one misses cards
+CARD_AREA_FRAC = (0.015, 0.15)  # card box area as a fraction of the frame area
+CAPTURE_MONITOR = 0  # mss monitor index: 0 = all monitors combined, 1 = primary, ...
+CAPTURE_MARGIN = 24  # pixels captured around the calibrated tile grid
+# Frame-settle detection: poll small grabs until consecutive frames stop changing
+SETTLE_POLL_SEC = 0.03
+SETTLE_DIFF = 1.5  # mean absolute grey-level difference treated as "still"
+SETTLE_STABLE_FRAMES = 2  # consecutive still frames required
+SETTLE_TIMEOUT_SEC = 1.5
+# Hover preview: learned once per tile position from a full-screen diff, then captured alone
+HOVER_LEARN_DIFF = 25  # grey-level change that marks a thumbnail pixel as part of the popup
+HOVER_TITLE_BAND = (0.035, 0.105)  # title line, as fractions of the preview's height
+PIPELINE_DEPTH = 2  # captured pages queued for background recognition; 0 = sequential
+RECOGNIZE_POOL = "thread"  # "thread" or "process" pool for per-tile OCR and dot counting
+RECOGNIZE_WORKERS = min(12, os.cpu_count() or 4)  # 1 disables the pool
+OCR_BATCH = True  # OCR all title bands of a page in one Tesseract call
+OCR_MIN_CONF = 60  # batched results below this mean confidence are re-read per tile
+RESOLVE_MIN_CONF = 0.8  # a resolver tier's answer at or above this skips the costlier tiers
+EXPORT_FORMATS = ("csv",)  # any of "csv", "jsonl", "arena"
+EXPORT_INTERVAL_SEC = 30  # export during a scan at most this often; 0 = only at the end
+TRACE_ENABLED = True  # per-stage timing spans, appended to TRACE_PATH
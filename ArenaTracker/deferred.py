@@ -0,0 +1,77 @@
+"""Deferred name resolution: titles queued during a scan, looked up in bulk afterwards.
+
+Kept free of OpenCV and NumPy so `arena-tracker cache resolve` runs on a headless box."""
+from typing import Dict, Optional, Tuple
+from config import SCRYFALL_FALLBACK
+from store import cache_art, clear_deferred, deferred_names, remember_tiles, upsert_collection
+from namecache import name_cache
+from tracing import span
+
+
+def resolve_texts(raws) -> Dict[str, Optional[Dict]]:
+    """Look up many OCR titles at once: name cache, catalog, then one batched Scryfall pass.
+
+    Titles missing from the result could not be checked (Scryfall unreachable); every
+    other title maps to its card, or None once all available tiers have rejected it."""
+    out: Dict[str, Optional[Dict]] = {}
+    rest = []
+    for raw in dict.fromkeys(raws):
+        hit, info = name_cache.get(raw)
+        if hit:
+            out[raw] = info
+        else:
+            rest.append(raw)
+    from catalog import get_catalog
+
+    cat = get_catalog()
+    if cat:
+        with span("deferred.catalog", titles=len(rest)):
+            found = {raw: cat.lookup(raw) for raw in rest}
+        rest = [raw for raw in rest if found[raw] is None]
+        for raw, info in found.items():
+            if info:
+                out[raw] = info
+                name_cache.put(raw, info)
+    if rest and SCRYFALL_FALLBACK:
+        from scryfall import fetch_collection, fetch_named, ScryfallUnavailable
+
+        try:
+            with span("deferred.scryfall", titles=len(rest)):
+                exact = fetch_collection(rest)
+                for raw in rest:
+                    out[raw] = exact.get(raw) or fetch_named(raw)
+                    name_cache.put(raw, out[raw])
+        except ScryfallUnavailable:
+            pass
+    elif rest:
+        for raw in rest:
+            out[raw] = None
+            # Without a catalog nothing was really checked; a later one may know the name.
+            if cat:
+                name_cache.put(raw, None)
+    return out
+
+
+def resolve_deferred() -> Tuple[int, int]:
+    """Resolve every queued title in one deduplicated pass and fill in the collection.
+
+    Returns (tiles resolved, tiles still queued). Titles that name no card are dropped;
+    ones that could not be checked stay queued for the next drain."""
+    rows = deferred_names()
+    if not rows:
+        return 0, 0
+    with span("deferred.resolve", tiles=len(rows)):
+        infos = resolve_texts(r[1] for r in rows)
+    done, resolved = [], 0
+    for sig, raw, ahash_, dhash_, phash_, owned in rows:
+        if raw not in infos:
+            continue
+        done.append(sig)
+        info = infos[raw]
+        if info:
+            resolved += 1
+            upsert_collection(info["name"], owned, info)
+            cache_art(ahash_, info, dhash_, phash_)
+            remember_tiles([sig], [(info, owned)])
+    clear_deferred(done)
+    return resolved, len(rows) - len(done)
@@ -0,0 +1,108 @@
+"""Collection export: kept in memory, refreshed from dirty rows only, written atomically."""
+import csv, json, os, tempfile, threading, time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+from config import CSV_PATH, JSONL_PATH, ARENA_PATH, EXPORT_FORMATS, EXPORT_INTERVAL_SEC
+from store import collection_rows, take_dirty
+
+Row = Tuple[str, int, Optional[str], Optional[str]]
+
+
+def _write_csv(rows: Iterable[Row], f):
+    w = csv.writer(f)
+    w.writerow(["Card Name", "Owned Copies", "Scryfall ID", "Scryfall URI"])
+    for r in rows:
+        w.writerow(r)
+
+
+def _write_jsonl(rows: Iterable[Row], f):
+    for name, count, sid, uri in rows:
+        f.write(json.dumps({"name": name, "count": count, "scryfall_id": sid, "uri": uri}) + "\n")
+
+
+def _write_arena(rows: Iterable[Row], f):
+    """Arena's deck import text: one "<count> <name>" line per owned card."""
+    for name, count, _, _ in rows:
+        if count:
+            f.write(f"{count} {name}\n")
+
+
+FORMATS: Dict[str, Tuple[Path, Callable]] = {
+    "csv": (CSV_PATH, _write_csv),
+    "jsonl": (JSONL_PATH, _write_jsonl),
+    "arena": (ARENA_PATH, _write_arena),
+}
+
+
+def write_atomic(path: Path, write: Callable, rows: Iterable[Row]):
+    """Write through a temp file in the same directory, then rename over `path`."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+            write(rows, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class Exporter:
+    """Mirrors the collection table and rewrites the export files only when rows changed.
+
+    The table is read once; later exports fetch just the names upserted since the last
+    one. maybe_export() is cheap enough to call after every page."""
+
+    def __init__(
+        self, formats: Sequence[str] = EXPORT_FORMATS, interval: float = EXPORT_INTERVAL_SEC
+    ):
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"unknown export formats: {sorted(unknown)}")
+        self.formats = list(formats)
+        self.interval = interval
+        self._rows: Optional[Dict[str, Row]] = None
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> bool:
+        if self._rows is None:
+            take_dirty()
+            self._rows = {r[0]: tuple(r) for r in collection_rows()}
+            return True
+        dirty = take_dirty()
+        for r in collection_rows(dirty) if dirty else ():
+            self._rows[r[0]] = tuple(r)
+        return bool(dirty)
+
+    def export(self, force: bool = False) -> bool:
+        """Write every format if anything changed (or `force`); True if files were written."""
+        with self._lock:
+            changed = self._refresh()
+            missing = any(not FORMATS[fmt][0].exists() for fmt in self.formats)
+            self._last = time.monotonic()
+            if not (changed or force or missing):
+                return False
+            rows = sorted(self._rows.values(), key=lambda r: r[0].lower())
+            for fmt in self.formats:
+                path, write = FORMATS[fmt]
+                write_atomic(path, write, rows)
+            return True
+
+    def maybe_export(self) -> bool:
+        """export() if EXPORT_INTERVAL_SEC has passed since the last one; 0 disables."""
+        if self.interval <= 0 or time.monotonic() - self._last < self.interval:
+            return False
+        return self.export()
+
+    def paths(self):
+        return [FORMATS[fmt][0] for fmt in self.formats]
+
+
+exporter = Exporter()
+
+
+def export_now(force: bool = True) -> bool:
+    return exporter.export(force)
@@ -0,0 +1,64 @@
+import cv2, numpy as np
+from typing import Dict, List, Sequence
+
+ALGOS = ("ahash", "dhash", "phash")
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def _gray_stack(grays: Sequence[np.ndarray], w: int, h: int) -> np.ndarray:
+    return np.stack(
+        [cv2.resize(g, (w, h), interpolation=cv2.INTER_AREA) for g in grays]
+    ).astype(np.float32)
+
+
+def _pack(bits: np.ndarray) -> np.ndarray:
+    """(N, 64) booleans, first bit most significant -> (N,) uint64."""
+    return np.packbits(bits.reshape(len(bits), 64), axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+def ahash(g8: np.ndarray) -> np.ndarray:
+    return _pack(g8 > g8.mean(axis=(1, 2), keepdims=True))
+
+
+def dhash(g98: np.ndarray) -> np.ndarray:
+    return _pack(g98[:, :, 1:] > g98[:, :, :-1])
+
+
+def phash(g32: np.ndarray) -> np.ndarray:
+    low = (_DCT32 @ g32 @ _DCT32.T)[:, :8, :8]
+    return _pack(low > np.median(low.reshape(len(low), 64), axis=1)[:, None, None])
+
+
+def fingerprints(crops: Sequence[np.ndarray], algos: Sequence[str] = ALGOS) -> Dict[str, np.ndarray]:
+    """Hash a batch of BGR crops; returns one (N,) uint64 array per algorithm."""
+    if not len(crops):
+        return {a: np.zeros(0, dtype=np.uint64) for a in algos}
+    grays = [cv2.cvtColor(c, cv2.COLOR_BGR2GRAY) for c in crops]
+    out = {}
+    if "ahash" in algos:
+        out["ahash"] = ahash(_gray_stack(grays, 8, 8))
+    if "dhash" in algos:
+        out["dhash"] = dhash(_gray_stack(grays, 9, 8))
+    if "phash" in algos:
+        out["phash"] = phash(_gray_stack(grays, 32, 32))
+    return out
+
+
+def to_hex(v) -> str:
+    return f"{int(v):016x}"
+
+
+def fingerprints_hex(crops: Sequence[np.ndarray], algos: Sequence[str] = ALGOS) -> List[Dict[str, str]]:
+    """Per-crop {algo: 16-digit hex} dicts, the form stored in art_map."""
+    fps = fingerprints(crops, algos)
+    return [{a: to_hex(fps[a][i]) for a in algos} for i in range(len(crops))]
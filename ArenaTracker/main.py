@@ -1,37 +1,78 @@
-import time, hashlib, cv2
-from typing import List
-from config import DATA_DIR, LOG_PATH, CALIB_PATH, PAGE_SETTLE_SEC, CSV_PATH
-from capture import bring_front, screenshot, mouse_safe
+import time, queue, threading
+from pathlib import Path
+from typing import List, Optional
+from config import (
+    DATA_DIR,
+    LOG_PATH,
+    CALIB_PATH,
+    FRAMES_DIR,
+    PIPELINE_DEPTH,
+    CAPTURE_MARGIN,
+)
 from calibrate import (
     calibrate,
     save_calibration,
     load_calibration,
     Tile,
     layout_matches,
+    has_signature,
+    grid_bbox,
+    rebase_tiles,
+)
+from recognize import (
+    recognize_page_cached,
+    crop_tiles,
+    page_signature,
+    make_pool,
+    name_cache,
+    resolver,
 )
-from recognize import resolve_name, count_black_dots
-from store import upsert_collection, export_csv
+from deferred import resolve_deferred
+from store import upsert_collection, flush, close_session, begin_run, end_run
+from export import exporter
 from overlay import show_overlay, close_overlay
+from replay import FrameRecorder, ReplaySource
+from tracing import span, tracer, summary_lines
+
+
+_log_file = None
+_log_lock = threading.Lock()
 
 
 def log(msg: str):
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    global _log_file
     line = f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}"
     print(line)
-    with open(LOG_PATH, "a") as f:
-        f.write(line + "\n")
-
+    with _log_lock:
+        if _log_file is None:
+            DATA_DIR.mkdir(parents=True, exist_ok=True)
+            _log_file = open(LOG_PATH, "a", buffering=1)
+        _log_file.write(line + "\n")
 
-def page_sig(frame, tiles: List[Tile]) -> str:
-    roi = tiles[0].title.crop(frame)
-    roi = cv2.resize(roi, (64, 16), interpolation=cv2.INTER_AREA)
-    return hashlib.sha1(roi.tobytes()).hexdigest()[:16]
 
+def close_log():
+    global _log_file
+    with _log_lock:
+        if _log_file is not None:
+            _log_file.close()
+            _log_file = None
 
-def next_page():
-    import pyautogui
 
-    pyautogui.press("right")
+def log_summary():
+    """Per-stage p50/p95/max and cache hit rates for the run so far."""
+    for line in summary_lines():
+        log(line)
+    st = name_cache.stats()
+    lookups = st["memory_hits"] + st["db_hits"] + st["misses"]
+    if lookups:
+        log(f"Name cache: {st} hit rate {(lookups - st['misses']) / lookups:.1%}")
+    for tier, st in resolver.stats().items():
+        if st["tried"]:
+            log(f"Resolver {tier}: tried {st['tried']} answered {st['answered']} won {st['won']}")
+    c = tracer.counters()
+    tiles = c.get("tiles.reused", 0) + c.get("tiles.recognized", 0)
+    if tiles:
+        log(f"Page results reused for {c.get('tiles.reused', 0)}/{tiles} tiles")
 
 
 def prompt_to_resume() -> bool:
@@ -75,8 +116,28 @@ def prompt_to_resume() -> bool:
     return result["choice"] == "retry"
 
 
-def ensure_layout(frame, tiles: List[Tile], preview: bool):
-    if layout_matches(frame, tiles):
+def _learned(tiles: List[Tile]):
+    return [(has_signature(t), t.dot_slots is not None) for t in tiles]
+
+
+def checked_layout(frame, tiles: List[Tile], region=None) -> bool:
+    """layout_matches, saving anything it learned for an older calibration file.
+
+    `tiles` are in the coordinates of `frame`, a capture of `region`; the calibration
+    is written back in monitor coordinates."""
+    before = _learned(tiles)
+    ok = layout_matches(frame, tiles)
+    if ok and _learned(tiles) != before:
+        origin = region[:2] if region else (0, 0)
+        save_calibration(rebase_tiles(tiles, (-origin[0], -origin[1])))
+        log(f"Updated calibration at {CALIB_PATH}")
+    return ok
+
+
+def ensure_layout(frame, tiles: List[Tile], preview: bool, region=None):
+    from capture import bring_front, mouse_safe, wait_settled, screenshot
+
+    if checked_layout(frame, tiles, region):
         return frame
 
     log("Card grid obstructed. Waiting for user intervention…")
@@ -86,102 +147,248 @@ def ensure_layout(frame, tiles: List[Tile], preview: bool):
         if not prompt_to_resume():
             return None
         bring_front()
-        time.sleep(0.5)
         mouse_safe()
-        time.sleep(0.15)
-        frame = screenshot()
+        wait_settled(kind="resume")
+        frame = screenshot(region)
         show_overlay(frame, tiles, preview)
-        if layout_matches(frame, tiles):
+        if checked_layout(frame, tiles, region):
             log("Card grid restored. Resuming.")
             return frame
 
 
-def run(recalibrate: bool = False, preview: bool = False, hover_ocr: bool = False):
+def calibrate_screen(preview: bool = False, recalibrate: bool = True) -> List[Tile]:
+    """Tiles in monitor coordinates: detected on the current screen, or the saved ones."""
+    from capture import bring_front, screenshot, wait_settled
+
     bring_front()
-    time.sleep(0.5)
-    frame = screenshot()
-
-    if recalibrate or not CALIB_PATH.exists():
-        log("Calibrating (edge-based)…")
-        tiles = calibrate(frame, preview=preview)
-        save_calibration(tiles)
-        log(f"Saved calibration to {CALIB_PATH}")
+    wait_settled(kind="startup")
+    if not recalibrate and CALIB_PATH.exists():
+        return load_calibration()
+    log("Calibrating (edge-based)…")
+    tiles = calibrate(screenshot(), preview=preview)
+    save_calibration(tiles)
+    log(f"Saved calibration to {CALIB_PATH}")
+    return tiles
+
+
+def process_page(
+    page_idx, crops, tiles, hover_tiles, pool, reuse=True, frame=None, preview=False, defer=None
+):
+    """Recognize and store one page. `frame` is only needed for the per-tile preview.
+
+    `tiles` are in frame coordinates; `hover_tiles` (monitor coordinates) enable hover OCR.
+    `defer` ("page" or "run") queues titles needing a lookup and drains them per page or
+    at the end of the run."""
+    show_tiles = preview and frame is not None
+    if show_tiles:
+        show_overlay(
+            frame,
+            tiles,
+            preview,
+            message=f"Scanning {len(tiles)} cards",
+            hold_ms=350,
+        )
+    with span("page.recognize"):
+        results = recognize_page_cached(crops, hover_tiles, pool, reuse, defer=bool(defer))
+    for idx, (info, owned) in enumerate(results):
+        name = info["name"] if info else ""
+
+        if show_tiles:
+            display_name = name if name else "<unrecognized>"
+            trimmed = display_name[:48]
+            msg = f"Card {idx + 1}/{len(tiles)}: {trimmed}"
+            if name:
+                msg += f" (owned: {owned})"
+            else:
+                msg += f" (dots: {owned})"
+            show_overlay(
+                frame,
+                tiles,
+                preview,
+                highlight_idx=idx,
+                message=msg,
+                hold_ms=600,
+            )
+
+        if name:
+            upsert_collection(name, owned, info)
+    if defer == "page":
+        drain_deferred()
+    with span("db.write"):
+        flush()
+    with span("export"):
+        exporter.maybe_export()
+    log(f"Processed page {page_idx}")
+
+
+def drain_deferred():
+    resolved, left = resolve_deferred()
+    if resolved or left:
+        log(f"Resolved {resolved} deferred titles; {left} still queued")
+
+
+class PageWorker(threading.Thread):
+    """Background recognition stage fed by a bounded queue of cropped pages."""
+
+    def __init__(self, depth: int):
+        super().__init__(name="page-worker", daemon=True)
+        self.jobs: "queue.Queue" = queue.Queue(maxsize=depth)
+        self.error = None
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            if self.error is not None:
+                continue  # keep draining so the producer never blocks on a dead stage
+            try:
+                process_page(*job)
+            except BaseException as e:
+                self.error = e
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    def submit(self, *job):
+        self.check()
+        self.jobs.put(job)
+
+    def finish(self):
+        """Stop the stage once queued pages are done; errors are left for check()."""
+        self.jobs.put(None)
+        self.join()
+
+
+def run(
+    recalibrate: bool = False,
+    preview: bool = False,
+    hover_ocr: bool = False,
+    full_rescan: bool = False,
+    record: bool = False,
+    replay: Optional[Path] = None,
+    defer: Optional[str] = None,
+):
+    if replay is not None:
+        # Headless: frames and tile geometry come from the recording.
+        source = ReplaySource(replay)
+        local = source.tiles
+        hover_tiles = None
+        region = None
+        log(f"Replaying {len(source.entries)} recorded pages from {replay}")
     else:
-        tiles = load_calibration()
+        from capture import LiveSource
+
+        tiles = calibrate_screen(preview, recalibrate)
+
+        # Only the grid is captured from here on; `local` are the tiles in that frame.
+        region = grid_bbox(tiles, CAPTURE_MARGIN)
+        local = rebase_tiles(tiles, region)
+        hover_tiles = tiles if hover_ocr else None
+        source = LiveSource(region)
+
+    recorder = None
+    if record:
+        rec_dir = FRAMES_DIR / time.strftime("%Y%m%d-%H%M%S")
+        recorder = FrameRecorder(rec_dir, local)
+        log(f"Recording frames to {rec_dir}")
 
     seen = set()
     first = None
     page_idx = 0
+    pool = make_pool()
+    # Hover OCR needs the page to stay on screen while its tiles are recognized.
+    worker = PageWorker(PIPELINE_DEPTH) if PIPELINE_DEPTH > 0 and not hover_tiles else None
+    if worker:
+        worker.start()
+    reuse = not full_rescan
+    baseline = None
+    run_id = begin_run(f"replay {replay}" if replay is not None else "live")
+    failed = True
     try:
         while True:
-            mouse_safe()
-            time.sleep(0.15)
-            frame = screenshot()
-            frame = ensure_layout(frame, tiles, preview)
+            with span("settle"):
+                waited = source.settle(baseline)
+            if waited is not None:
+                log(f"Page {page_idx} settled in {waited * 1000:.0f} ms")
+            with span("capture"):
+                frame = source.grab()
+            if frame is None:
+                log("No more recorded pages. Stopping.")
+                break
+            if replay is None:
+                with span("layout_check"):
+                    frame = ensure_layout(frame, local, preview, region)
             if frame is None:
                 log("User aborted after obstruction. Stopping.")
                 break
-            sig = page_sig(frame, tiles)
+            with span("page_signature"):
+                crops = crop_tiles(frame, local)
+                sig = page_signature(crops)
             if first is None:
                 first = sig
             if sig in seen and sig == first and page_idx > 0:
                 log("Detected loop to first page. Stopping.")
                 break
             seen.add(sig)
+            if recorder:
+                recorder.record(page_idx, frame)
 
-            show_overlay(frame, tiles, preview)
-
-            # Process
-            for idx, t in enumerate(tiles):
-                if preview and page_idx == 0:
-                    show_overlay(
-                        frame,
-                        tiles,
-                        preview,
-                        highlight_idx=idx,
-                        message=f"Scanning card {idx + 1}/{len(tiles)}",
-                        hold_ms=350,
-                    )
-                info = resolve_name(frame, t, use_hover=hover_ocr)
-                name = info["name"] if info else ""
-                owned = count_black_dots(t.dots.crop(frame))
-
-                if preview and page_idx == 0:
-                    display_name = name if name else "<unrecognized>"
-                    trimmed = display_name[:48]
-                    msg = f"Card {idx + 1}/{len(tiles)}: {trimmed}"
-                    if name:
-                        msg += f" (owned: {owned})"
-                    else:
-                        msg += f" (dots: {owned})"
-                    show_overlay(
-                        frame,
-                        tiles,
-                        preview,
-                        highlight_idx=idx,
-                        message=msg,
-                        hold_ms=600,
-                    )
+            show_overlay(frame, local, preview)
 
-                if name:
-                    upsert_collection(name, owned, info)
-            export_csv()
-            log(f"Processed page {page_idx}. CSV at {CSV_PATH}")
+            if worker is None or (preview and page_idx == 0):
+                process_page(
+                    page_idx, crops, local, hover_tiles, pool, reuse, frame, preview, defer
+                )
+            else:
+                worker.submit(page_idx, crops, local, hover_tiles, pool, reuse, None, False, defer)
 
-            next_page()
-            time.sleep(PAGE_SETTLE_SEC)
+            baseline = source.baseline()
+            source.next_page()
             page_idx += 1
+        failed = False
     finally:
-        if preview:
-            close_overlay()
+        if worker:
+            worker.finish()
+        try:
+            if pool:
+                pool.shutdown()
+            if recorder:
+                recorder.close()
+            if defer:
+                drain_deferred()
+            with span("export"):
+                exporter.export()
+            log(f"Exported collection to {', '.join(str(p) for p in exporter.paths())}")
+        finally:
+            end_run()
+            log(f"Recorded scan run {run_id}")
+            log_summary()
+            tracer.flush()
+            if replay is None:
+                from capture import settle_times, close_grabber
+
+                for kind, times in settle_times.items():
+                    log(
+                        f"Settle ({kind}): n={len(times)} "
+                        f"mean={sum(times) / len(times) * 1000:.0f} ms "
+                        f"max={max(times) * 1000:.0f} ms"
+                    )
+                close_grabber()
+            close_session()
+            if preview:
+                close_overlay()
+            close_log()
+        # A failed page surfaces only now, after everything buffered has been written.
+        if worker and not failed:
+            worker.check()
 
 
 if __name__ == "__main__":
     import argparse
+    from cli import add_scan_args, scan_options
 
     p = argparse.ArgumentParser()
-    p.add_argument("--recalibrate", action="store_true")
-    p.add_argument("--preview", action="store_true")
-    p.add_argument("--hover-ocr", action="store_true")
-    args = p.parse_args()
-    run(recalibrate=args.recalibrate, preview=args.preview, hover_ocr=args.hover_ocr)
+    add_scan_args(p)
+    run(**scan_options(p.parse_args()))
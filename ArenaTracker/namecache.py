@@ -0,0 +1,76 @@
+import time, threading
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+from config import CARD_CACHE_SIZE, CARD_CACHE_TTL_SEC, NEGATIVE_CACHE_TTL_SEC
+from store import card_map_entry, cache_card_name
+
+
+class NameCache:
+    """Bounded LRU in front of the card_map table, with TTLs and negative entries."""
+
+    def __init__(
+        self,
+        size: int = CARD_CACHE_SIZE,
+        ttl: float = CARD_CACHE_TTL_SEC,
+        negative_ttl: float = NEGATIVE_CACHE_TTL_SEC,
+    ):
+        self.size = size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lru: "OrderedDict[str, Tuple[Optional[Dict], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def _remember(self, raw: str, info: Optional[Dict], ts: float):
+        expires = ts + (self.ttl if info else self.negative_ttl)
+        self._lru[raw] = (info, expires)
+        self._lru.move_to_end(raw)
+        while len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+
+    def get(self, raw: str) -> Tuple[bool, Optional[Dict]]:
+        """Return (hit, info). A hit with info=None is a cached rejection."""
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(raw)
+            if entry and entry[1] > now:
+                self._lru.move_to_end(raw)
+                self.memory_hits += 1
+                if entry[0] is None:
+                    self.negative_hits += 1
+                return True, entry[0]
+            if entry:
+                del self._lru[raw]
+        row = card_map_entry(raw)
+        if row:
+            info, ts = row
+            if ts + (self.ttl if info else self.negative_ttl) > now:
+                with self._lock:
+                    self._remember(raw, info, ts)
+                    self.db_hits += 1
+                    if info is None:
+                        self.negative_hits += 1
+                return True, info
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def put(self, raw: str, info: Optional[Dict]):
+        cache_card_name(raw, info)
+        with self._lock:
+            self._remember(raw, info, time.time())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+        }
+
+
+# Shared by the scan's resolver tiers and the deferred bulk resolver.
+name_cache = NameCache()
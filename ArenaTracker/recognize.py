@@ -1,8 +1,34 @@
-import cv2, numpy as np
-from typing import Optional, Dict
-from config import MAX_DOTS
-from store import lookup_card_by_ocr, cache_card_name, iter_art_cache, cache_art
-from capture import hover_screenshot
+import hashlib, cv2, numpy as np
+from dataclasses import dataclass
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Dict, List, Tuple
+from config import (
+    MAX_DOTS,
+    DOT_DARK_LEVEL,
+    SCRYFALL_FALLBACK,
+    ART_MAX_DIST,
+    FINGERPRINT_ALGO,
+    RECOGNIZE_POOL,
+    RECOGNIZE_WORKERS,
+    OCR_BATCH,
+    OCR_MIN_CONF,
+    RESOLVE_MIN_CONF,
+)
+from store import (
+    art_index,
+    legacy_art_index,
+    cache_art,
+    page_results,
+    tile_results,
+    remember_page,
+    defer_name,
+)
+from catalog import get_catalog
+from artcatalog import get_art_catalog
+from namecache import name_cache
+from fingerprint import fingerprints_hex
+from cascade import Candidate, Cascade, Tier
+from tracing import span, count
 
 
 def clean_text(s: str) -> str:
@@ -19,10 +45,57 @@ def ocr_title(img) -> str:
     return clean_text(txt)
 
 
+BATCH_BAND_H = 48
+BATCH_SEP_H = 24
+
+
+def _batch_band(img) -> np.ndarray:
+    g = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    if g.mean() < 128:  # Arena titles are light on dark; Tesseract prefers dark on light
+        g = 255 - g
+    scale = BATCH_BAND_H / max(1, g.shape[0])
+    return cv2.resize(g, (max(1, int(g.shape[1] * scale)), BATCH_BAND_H), interpolation=cv2.INTER_CUBIC)
+
+
+def ocr_titles(imgs) -> List[Tuple[str, float]]:
+    """OCR many title bands with one Tesseract run; returns (text, mean confidence) per band.
+
+    Bands are stacked top to bottom on a white canvas with blank separators, and the
+    returned word boxes are mapped back to bands by their vertical centre."""
+    import pytesseract
+
+    if not len(imgs):
+        return []
+    bands = [_batch_band(im) for im in imgs]
+    pitch = BATCH_BAND_H + BATCH_SEP_H
+    width = max(b.shape[1] for b in bands) + 2 * BATCH_SEP_H
+    canvas = np.full((BATCH_SEP_H + pitch * len(bands), width), 255, dtype=np.uint8)
+    for i, b in enumerate(bands):
+        y = BATCH_SEP_H + i * pitch
+        canvas[y : y + BATCH_BAND_H, BATCH_SEP_H : BATCH_SEP_H + b.shape[1]] = b
+    d = pytesseract.image_to_data(
+        canvas, config="--psm 6 -l eng", output_type=pytesseract.Output.DICT
+    )
+    words: List[List[Tuple[int, str, float]]] = [[] for _ in bands]
+    for text, conf, left, top, h in zip(d["text"], d["conf"], d["left"], d["top"], d["height"]):
+        conf = float(conf)
+        if not text.strip() or conf < 0:
+            continue
+        i, off = divmod(top + h // 2 - BATCH_SEP_H, pitch)
+        if 0 <= i < len(bands) and off < BATCH_BAND_H:
+            words[i].append((left, text, conf))
+    out = []
+    for ws in words:
+        ws.sort()
+        txt = clean_text(" ".join(w[1] for w in ws))
+        out.append((txt, sum(w[2] for w in ws) / len(ws) if ws else 0.0))
+    return out
+
+
 def count_black_dots(dot_img) -> int:
     g = cv2.cvtColor(dot_img, cv2.COLOR_BGR2GRAY)
     g = cv2.medianBlur(g, 3)
-    th = cv2.threshold(g, 60, 255, cv2.THRESH_BINARY_INV)[1]
+    th = cv2.threshold(g, DOT_DARK_LEVEL, 255, cv2.THRESH_BINARY_INV)[1]
     th = cv2.morphologyEx(
         th, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)), 1
     )
@@ -38,60 +111,361 @@ def count_black_dots(dot_img) -> int:
     return min(owned, MAX_DOTS)
 
 
+def count_owned_batch(dot_imgs, slots: List[List[float]]) -> List[int]:
+    """Owned counts for a page from one sample of the calibrated pip slots.
+
+    Crops are stacked (resized to the first crop if they differ by a pixel), and a small
+    patch around each slot centre is averaged, so anti-aliased pip edges do not matter."""
+    h, w = dot_imgs[0].shape[:2]
+    stack = np.stack([im if im.shape[:2] == (h, w) else cv2.resize(im, (w, h)) for im in dot_imgs])
+    grey = stack.astype(np.float32) @ np.float32([0.114, 0.587, 0.299])
+    s = np.asarray(slots, dtype=np.float32)
+    cx = np.clip(np.rint(s[:, 0] * (w - 1)).astype(int), 0, w - 1)
+    cy = np.clip(np.rint(s[:, 1] * (h - 1)).astype(int), 0, h - 1)
+    off = np.arange(-max(1, h // 8), max(1, h // 8) + 1)
+    ys = np.clip(cy[:, None] + off, 0, h - 1)
+    xs = np.clip(cx[:, None] + off, 0, w - 1)
+    means = grey[:, ys[:, :, None], xs[:, None, :]].mean(axis=(2, 3))
+    return np.minimum((means < DOT_DARK_LEVEL).sum(axis=1), MAX_DOTS).tolist()
+
+
 def ahash(img) -> str:
-    g = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    g = cv2.resize(g, (8, 8), interpolation=cv2.INTER_AREA)
-    m = g.mean()
-    bits = (g > m).astype(np.uint8).flatten()
-    val = 0
-    for b in bits:
-        val = (val << 1) | int(b)
-    return f"{val:016x}"
+    return fingerprints_hex([img], ("ahash",))[0]["ahash"]
 
 
 def hamming(a: str, b: str) -> int:
     return bin(int(a, 16) ^ int(b, 16)).count("1")
 
 
+def art_matches(fps: List[Dict[str, str]]) -> List[Optional[Tuple[Dict, int]]]:
+    """Closest (info, distance) per fingerprint: learned art_map first, then the prebuilt
+    catalog, then art_map rows that only have an ahash."""
+    hashes = [fp[FINGERPRINT_ALGO] for fp in fps]
+    hits = art_index().nearest_many(hashes, ART_MAX_DIST)
+    missing = [i for i, h in enumerate(hits) if h is None or h[1] > 0]
+    cat = get_art_catalog() if missing else None
+    if cat is not None:
+        found = cat.nearest_many([hashes[i] for i in missing], ART_MAX_DIST, FINGERPRINT_ALGO)
+        for i, h in zip(missing, found):
+            if h and (hits[i] is None or h[1] < hits[i][1]):
+                hits[i] = h
+    missing = [i for i, h in enumerate(hits) if h is None]
+    legacy = legacy_art_index() if missing else None
+    if legacy:
+        found = legacy.nearest_many([fps[i]["ahash"] for i in missing], ART_MAX_DIST)
+        for i, h in zip(missing, found):
+            hits[i] = h
+    return hits
+
+
+def art_lookup_fps(fps: List[Dict[str, str]]) -> List[Optional[Dict]]:
+    with span("resolve.art"):
+        hits = art_matches(fps)
+    return [h[0] if h else None for h in hits]
+
+
+def art_lookup_many(tile_imgs) -> List[Optional[Dict]]:
+    return art_lookup_fps(fingerprints_hex(tile_imgs))
+
+
 def art_lookup(tile_img) -> Optional[Dict]:
-    target = ahash(tile_img)
-    best = None
-    best_d = 999
-    for ah, name, sid, uri in iter_art_cache():
-        d = hamming(target, ah)
-        if d < best_d:
-            best_d = d
-            best = {"name": name, "id": sid, "uri": uri}
-    return best if best and best_d <= 5 else None
-
-
-def resolve_name(frame, tile, use_hover: bool) -> Optional[Dict]:
-    # 1) OCR on title band
-    raw = ocr_title(tile.title.crop(frame)).strip()
-    if raw:
-        from scryfall import lookup_fuzzy
-
-        info = lookup_fuzzy(raw)
-        if info:
-            cache_card_name(raw, info)
-            return info
-    # 2) Hover OCR (big preview)
-    if use_hover:
-        cx = tile.rect.x + tile.rect.w // 2
-        cy = tile.rect.y + tile.rect.h // 2
-        pop = hover_screenshot(cx, cy)
-        raw2 = ocr_title(pop).strip()
-        if raw2:
-            from scryfall import lookup_fuzzy
-
-            info2 = lookup_fuzzy(raw2)
-            if info2:
-                cache_card_name(raw2, info2)
-                return info2
-    # 3) Local art hash
-    img = tile.rect.crop(frame)
-    info3 = art_lookup(img)
-    if info3:
-        cache_art(ahash(img), info3)
-        return info3
-    return None
+    return art_lookup_many([tile_img])[0]
+
+
+def remember_art(fp: Dict[str, str], info: Dict):
+    cache_art(fp["ahash"], info, fp.get("dhash"), fp.get("phash"))
+
+
+def lookup_name(raw: str) -> Optional[Dict]:
+    """Resolve an OCR string: local catalog first, Scryfall only for names it lacks.
+
+    Raises ScryfallUnavailable if the fallback could not reach the API."""
+    cat = get_catalog()
+    with span("resolve.catalog"):
+        info = cat.lookup(raw) if cat else None
+    if info is None and SCRYFALL_FALLBACK:
+        from scryfall import fetch_named
+
+        with span("resolve.scryfall"):
+            info = fetch_named(raw)
+    return info
+
+
+def lookup_cached(raw: str) -> Optional[Dict]:
+    with span("resolve.cache"):
+        hit, info = name_cache.get(raw)
+    if hit:
+        return info
+    from scryfall import ScryfallUnavailable
+
+    try:
+        info = lookup_name(raw)
+    except ScryfallUnavailable:
+        return None  # transient: don't remember it as garbage
+    if info or get_catalog() or SCRYFALL_FALLBACK:
+        name_cache.put(raw, info)
+    return info
+
+
+def hover_lookup(tile) -> Optional[Dict]:
+    from capture import hover_title
+
+    with span("resolve.hover"):
+        band = hover_title(tile.rect)
+        raw = ocr_title(band).strip() if band is not None else ""
+    return lookup_cached(raw) if raw else None
+
+
+@dataclass
+class TileCrops:
+    rect: np.ndarray
+    title: np.ndarray
+    dots: np.ndarray
+    sig: str = ""
+    slots: Optional[List[List[float]]] = None
+
+
+def tile_sig(title_img, dots_img) -> str:
+    """Hash of the coarsely quantized title and dots bands; stable across re-captures."""
+    h = hashlib.sha1()
+    for img, size in ((title_img, (64, 16)), (dots_img, (32, 8))):
+        g = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        g = cv2.resize(g, size, interpolation=cv2.INTER_AREA)
+        h.update((g >> 4).tobytes())
+    return h.hexdigest()[:16]
+
+
+def page_signature(crops: List[TileCrops]) -> str:
+    return hashlib.sha1("".join(c.sig for c in crops).encode()).hexdigest()[:16]
+
+
+def crop_tiles(frame, tiles) -> List[TileCrops]:
+    """Copy out every ROI recognition needs, so the frame itself can be released."""
+    out = []
+    for t in tiles:
+        title, dots = t.title.crop(frame).copy(), t.dots.crop(frame).copy()
+        out.append(
+            TileCrops(t.rect.crop(frame).copy(), title, dots, tile_sig(title, dots), t.dot_slots)
+        )
+    return out
+
+
+def make_pool(kind: str = RECOGNIZE_POOL, workers: int = RECOGNIZE_WORKERS) -> Optional[Executor]:
+    if workers <= 1:
+        return None
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recognize")
+
+
+@dataclass
+class PageContext:
+    """State shared by the resolver tiers while one batch of tiles is resolved."""
+
+    crops: List[TileCrops]
+    fps: List[Dict[str, str]]
+    pool: Optional[Executor] = None
+    hover_tiles: Optional[list] = None
+    # Title reads by tile index (text, Tesseract confidence), filled on first use.
+    texts: Optional[Dict[int, Tuple[str, float]]] = None
+    # Tile index -> title text already known not to name a card.
+    rejected: Optional[Dict[int, str]] = None
+
+    def text(self, i: int) -> str:
+        txt = self.texts.get(i, ("", 0.0))[0] if self.texts else ""
+        return "" if self.rejected and self.rejected.get(i) == txt else txt
+
+    def reject(self, i: int, txt: str):
+        self.rejected = self.rejected or {}
+        self.rejected[i] = txt
+
+
+def _art_tier(ctx: PageContext, idxs: List[int]) -> Dict[int, Optional[Candidate]]:
+    hits = art_matches([ctx.fps[i] for i in idxs])
+    # Distance 0 is certain; at ART_MAX_DIST a match is only a last resort.
+    return {
+        i: Candidate(h[0], 1.0 - 0.5 * h[1] / max(1, ART_MAX_DIST)) if h else None
+        for i, h in zip(idxs, hits)
+    }
+
+
+def _cache_tier(ctx: PageContext, idxs: List[int]) -> Dict[int, Optional[Candidate]]:
+    """Batched title OCR, answered only from names resolved before.
+
+    Its tier.cache span therefore includes the Tesseract call, timed alone as ocr.batch."""
+    if ctx.texts is None:
+        titles = [ctx.crops[i].title for i in idxs]
+        with span("ocr.batch", tiles=len(titles)):
+            reads = ocr_titles(titles) if OCR_BATCH else [("", 0.0)] * len(titles)
+        ctx.texts = dict(zip(idxs, reads))
+    return {i: _cached(ctx, i) for i in idxs}
+
+
+def _cached(ctx: PageContext, i: int) -> Optional[Candidate]:
+    raw = ctx.text(i)
+    if not raw:
+        return None
+    hit, info = name_cache.get(raw)
+    if hit and info is None:
+        ctx.reject(i, raw)
+    return Candidate(info, 1.0) if info else None
+
+
+def _catalog_tier(ctx: PageContext, idxs: List[int]) -> Dict[int, Optional[Candidate]]:
+    cat = get_catalog()
+    if cat is None:
+        return {}
+    out = {}
+    for i in idxs:
+        raw = ctx.text(i)
+        m = cat.match(raw) if raw else None
+        if m:
+            name_cache.put(raw, m[0])
+            out[i] = Candidate(m[0], m[1] / 100.0)
+        elif raw and not SCRYFALL_FALLBACK:
+            name_cache.put(raw, None)
+            ctx.reject(i, raw)
+    return out
+
+
+def _retry_tier(ctx: PageContext, idxs: List[int]) -> Dict[int, Optional[Candidate]]:
+    """Own Tesseract run for titles the batched pass could not read confidently."""
+    texts = ctx.texts or {}
+    redo = [i for i in idxs if texts.get(i, ("", 0.0))[1] < OCR_MIN_CONF or not ctx.text(i)]
+    if not redo:
+        return {}
+    mapper = ctx.pool.map if ctx.pool else map
+    raws = list(mapper(ocr_title, [ctx.crops[i].title for i in redo]))
+    ctx.texts = dict(texts)
+    for i, raw in zip(redo, raws):
+        ctx.texts[i] = (raw.strip(), 100.0)
+    out = {i: _cached(ctx, i) for i in redo}
+    out.update(_catalog_tier(ctx, [i for i in redo if not out[i]]))
+    return out
+
+
+def _scryfall_tier(ctx: PageContext, idxs: List[int]) -> Dict[int, Optional[Candidate]]:
+    """One /cards/collection request for exact titles, fuzzy /cards/named for the rest."""
+    if not SCRYFALL_FALLBACK:
+        return {}
+    from scryfall import fetch_collection, fetch_named, ScryfallUnavailable
+
+    raws = {i: ctx.text(i) for i in idxs if ctx.text(i)}
+    try:
+        exact = fetch_collection(list(raws.values())) if raws else {}
+    except ScryfallUnavailable:
+        return {}  # transient: don't remember anything as garbage
+
+    def fetch(i):
+        raw = raws.get(i)
+        if not raw:
+            return None
+        info = exact.get(raw)
+        if info is None:
+            try:
+                info = fetch_named(raw)
+            except ScryfallUnavailable:
+                return None
+        name_cache.put(raw, info)
+        return Candidate(info, 0.9) if info else None
+
+    lookup = ctx.pool.map if isinstance(ctx.pool, ThreadPoolExecutor) else map
+    return dict(zip(idxs, lookup(fetch, idxs)))
+
+
+def _hover_tier(ctx: PageContext, idxs: List[int]) -> Dict[int, Optional[Candidate]]:
+    # Moves the mouse, so it always runs serially in the caller's thread.
+    out = {}
+    for i in idxs if ctx.hover_tiles else ():
+        info = hover_lookup(ctx.hover_tiles[i])
+        out[i] = Candidate(info, 0.9) if info else None
+    return out
+
+
+resolver = Cascade(
+    [
+        Tier("art", 1, _art_tier),
+        Tier("cache", 10, _cache_tier),
+        Tier("catalog", 12, _catalog_tier),
+        Tier("ocr_retry", 40, _retry_tier),
+        Tier("scryfall", 100, _scryfall_tier),
+        Tier("hover", 400, _hover_tier),
+    ],
+    accept=RESOLVE_MIN_CONF,
+)
+
+
+# Tiers above this cost need the network or the mouse; deferred scans stop before them.
+LOCAL_TIER_COST = 50
+
+
+def _resolve(crops: List[TileCrops], hover_tiles, pool, max_cost=None):
+    with span("fingerprint"):
+        fps = fingerprints_hex([c.rect for c in crops])
+    ctx = PageContext(crops, fps, pool, hover_tiles)
+    best = resolver.run(ctx, len(crops), max_cost)
+    for fp, c in zip(fps, best):
+        if c and c.tier != "art":
+            remember_art(fp, c.info)
+    return best, ctx
+
+
+def resolve_infos(
+    crops: List[TileCrops], hover_tiles=None, pool: Optional[Executor] = None
+) -> List[Optional[Dict]]:
+    """Card info per tile from the resolver cascade; each art fingerprint is computed once."""
+    best, _ = _resolve(crops, hover_tiles, pool)
+    return [c.info if c else None for c in best]
+
+
+def recognize_page(
+    crops: List[TileCrops], hover_tiles=None, pool: Optional[Executor] = None, defer: bool = False
+) -> List[Tuple[Optional[Dict], int]]:
+    """Card info + owned-copy count for every tile, returned as (info, owned) in tile order.
+
+    Owned counts come from one sample of the calibrated pip slots, or from contour
+    counting over `pool` for tiles without slots. Hover OCR is enabled by passing the
+    tiles in monitor coordinates. With `defer`, only local tiers run and titles they
+    cannot name are queued for resolve_deferred."""
+    slots = crops[0].slots if crops and all(c.slots == crops[0].slots for c in crops) else None
+    if slots:
+        with span("dots.batch", tiles=len(crops)):
+            owned = count_owned_batch([c.dots for c in crops], slots)
+    else:
+        mapper = pool.map if pool else map
+        with span("dots", tiles=len(crops)):
+            owned = list(mapper(count_black_dots, [c.dots for c in crops]))
+    best, ctx = _resolve(crops, hover_tiles, pool, LOCAL_TIER_COST if defer else None)
+    if defer:
+        for i, c in enumerate(best):
+            if c is None and ctx.text(i):
+                defer_name(crops[i].sig, ctx.text(i), ctx.fps[i], owned[i])
+                count("tiles.deferred")
+    return [(c.info if c else None, n) for c, n in zip(best, owned)]
+
+
+def recognize_page_cached(
+    crops: List[TileCrops],
+    hover_tiles=None,
+    pool: Optional[Executor] = None,
+    reuse: bool = True,
+    defer: bool = False,
+) -> List[Tuple[Optional[Dict], int]]:
+    """recognize_page, reusing stored results for tiles whose signature was seen before.
+
+    An unchanged page costs one indexed query: no OCR, lookups or network calls."""
+    sigs = [c.sig for c in crops]
+    page = page_signature(crops)
+    with span("page.reuse_lookup"):
+        known = (page_results(page) or tile_results(sigs)) if reuse else {}
+    todo = [i for i, sig in enumerate(sigs) if sig not in known]
+    count("tiles.reused", len(sigs) - len(todo))
+    count("tiles.recognized", len(todo))
+    results: List[Tuple[Optional[Dict], int]] = [known.get(sig, (None, 0)) for sig in sigs]
+    if todo:
+        hover = [hover_tiles[i] for i in todo] if hover_tiles else None
+        fresh = recognize_page([crops[i] for i in todo], hover, pool, defer)
+        for i, r in zip(todo, fresh):
+            results[i] = r
+    remember_page(page, sigs, results)
+    return results
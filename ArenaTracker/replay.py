@@ -0,0 +1,59 @@
+import json, time, cv2
+from pathlib import Path
+from typing import List, Optional
+from calibrate import Tile, tiles_to_json, tiles_from_json
+
+MANIFEST = "manifest.jsonl"
+TILES = "tiles.json"
+
+
+class FrameRecorder:
+    """Writes each scanned page as a lossless PNG plus a JSON Lines manifest.
+
+    Frames are the grid-bounded captures, so `tiles.json` holds tiles in frame coordinates."""
+
+    def __init__(self, out_dir: Path, tiles: List[Tile]):
+        self.dir = Path(out_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        (self.dir / TILES).write_text(json.dumps(tiles_to_json(tiles)))
+        self._manifest = open(self.dir / MANIFEST, "a")
+
+    def record(self, page_idx: int, frame):
+        name = f"page_{page_idx:05d}.png"
+        cv2.imwrite(str(self.dir / name), frame, [cv2.IMWRITE_PNG_COMPRESSION, 3])
+        self._manifest.write(json.dumps({"page": page_idx, "file": name, "ts": time.time()}) + "\n")
+        self._manifest.flush()
+
+    def close(self):
+        self._manifest.close()
+
+
+class ReplaySource:
+    """Frame source over a recording; no display, mouse or keyboard needed."""
+
+    def __init__(self, rec_dir: Path):
+        self.dir = Path(rec_dir)
+        self.tiles = tiles_from_json(json.loads((self.dir / TILES).read_text()))
+        with open(self.dir / MANIFEST) as f:
+            self.entries = [json.loads(line) for line in f if line.strip()]
+        self._idx = 0
+
+    def settle(self, baseline=None) -> Optional[float]:
+        return None
+
+    def grab(self):
+        if self._idx >= len(self.entries):
+            return None
+        path = self.dir / self.entries[self._idx]["file"]
+        if not path.is_file():
+            raise FileNotFoundError(f"Recorded frame missing: {path}")
+        frame = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError(f"Recorded frame unreadable: {path}")
+        return frame
+
+    def baseline(self):
+        return None
+
+    def next_page(self):
+        self._idx += 1
@@ -1,20 +1,192 @@
-import requests
-from typing import Optional, Dict
+import time, threading, requests
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, List, Sequence
+from config import (
+    SCRYFALL_API,
+    SCRYFALL_RATE,
+    SCRYFALL_TIMEOUT,
+    SCRYFALL_BREAKER_FAILURES,
+    SCRYFALL_BREAKER_COOLDOWN_SEC,
+    RECOGNIZE_WORKERS,
+)
 
+COLLECTION_MAX = 75  # identifiers accepted per /cards/collection request
 
-def lookup_fuzzy(name: str) -> Optional[Dict]:
+
+class ScryfallUnavailable(Exception):
+    """The API could not be reached, answered with a server error, or the breaker is open."""
+
+
+def card_info(j: Dict) -> Dict:
+    return {
+        "name": j.get("name"),
+        "id": j.get("id"),
+        "uri": j.get("scryfall_uri"),
+        "set": j.get("set"),
+    }
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for `seconds`, e.g. after the server asked us to slow down."""
+        with self._lock:
+            self._tokens = 0.0
+            self._stamp = max(self._stamp, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive errors; one trial call is let through per cooldown."""
+
+    def __init__(self, failures: int, cooldown: float):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._count = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def check(self):
+        with self._lock:
+            if self._count < self.failures:
+                return
+            now = time.monotonic()
+            if now < self._open_until:
+                raise ScryfallUnavailable("circuit open")
+            self._open_until = now + self.cooldown  # half-open: this caller is the trial
+
+    def success(self):
+        with self._lock:
+            self._count = 0
+
+    def failure(self):
+        with self._lock:
+            self._count += 1
+            if self._count >= self.failures:
+                self._open_until = time.monotonic() + self.cooldown
+
+
+def _retry_after(r: requests.Response, default: float = 1.0) -> float:
     try:
-        r = requests.get(
-            "https://api.scryfall.com/cards/named", params={"fuzzy": name}, timeout=10
+        return min(max(0.0, float(r.headers.get("Retry-After", default))), 60.0)
+    except ValueError:  # an HTTP date; not worth parsing for a rate-limit hint
+        return default
+
+
+class ScryfallClient:
+    """Pooled, rate-limited Scryfall API client. `base_url` can point at a local stub server."""
+
+    def __init__(
+        self,
+        base_url: str = SCRYFALL_API,
+        rate: float = SCRYFALL_RATE,
+        timeout=SCRYFALL_TIMEOUT,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate)
+        self.breaker = breaker or CircuitBreaker(
+            SCRYFALL_BREAKER_FAILURES, SCRYFALL_BREAKER_COOLDOWN_SEC
         )
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": "ArenaTracker/1.0", "Accept": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, RECOGNIZE_WORKERS))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, method: str, path: str, **kw) -> requests.Response:
+        self.breaker.check()
+        self.bucket.acquire()
+        try:
+            r = self.session.request(method, self.base_url + path, timeout=self.timeout, **kw)
+        except requests.RequestException as e:
+            self.breaker.failure()
+            raise ScryfallUnavailable(str(e)) from e
+        if r.status_code >= 500 or r.status_code == 429:
+            self.breaker.failure()
+            if r.status_code == 429:
+                self.bucket.pause(_retry_after(r))
+            raise ScryfallUnavailable(f"HTTP {r.status_code}")
+        self.breaker.success()
+        return r
+
+    def named(self, name: str) -> Optional[Dict]:
+        """Fuzzy /cards/named lookup; None when Scryfall rejects the name."""
+        r = self._request("GET", "/cards/named", params={"fuzzy": name})
         if r.status_code != 200:
             return None
-        j = r.json()
-        return {
-            "name": j.get("name"),
-            "id": j.get("id"),
-            "uri": j.get("scryfall_uri"),
-            "set": j.get("set"),
-        }
-    except Exception:
-        return None
+        return card_info(r.json())
+
+    def collection(self, names: Sequence[str]) -> Dict[str, Dict]:
+        """Exact-name lookup of many cards, COLLECTION_MAX per request.
+
+        Returns the names Scryfall found, keyed as given; missing names are left out."""
+        wanted: Dict[str, List[str]] = {}
+        for n in names:
+            wanted.setdefault(n.strip().lower(), []).append(n)
+        keys = [k for k in wanted if k]
+        found: Dict[str, Dict] = {}
+        for lo in range(0, len(keys), COLLECTION_MAX):
+            chunk = keys[lo : lo + COLLECTION_MAX]
+            body = {"identifiers": [{"name": k} for k in chunk]}
+            r = self._request("POST", "/cards/collection", json=body)
+            if r.status_code != 200:
+                continue
+            for card in r.json().get("data", []):
+                info = card_info(card)
+                faces = [card.get("name")] + [f.get("name") for f in card.get("card_faces") or []]
+                for face in faces:
+                    for n in wanted.get((face or "").lower(), ()):
+                        found.setdefault(n, info)
+        return found
+
+    def close(self):
+        self.session.close()
+
+
+_client: Optional[ScryfallClient] = None
+_client_lock = threading.Lock()
+
+
+def client() -> ScryfallClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ScryfallClient()
+        return _client
+
+
+def set_client(c: Optional[ScryfallClient]):
+    """Use `c` for all lookups, e.g. one pointed at a local stub server."""
+    global _client
+    with _client_lock:
+        _client = c
+
+
+def fetch_named(name: str) -> Optional[Dict]:
+    """Fuzzy /cards/named lookup; None when Scryfall rejects the name."""
+    return client().named(name)
+
+
+def fetch_collection(names: Sequence[str]) -> Dict[str, Dict]:
+    return client().collection(names)
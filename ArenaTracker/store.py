@@ -1,98 +1,583 @@
-import sqlite3, time, csv
+import sqlite3, time, json, threading
 from pathlib import Path
-from typing import Optional, Dict, Iterable, Tuple
-from config import DB_PATH, CSV_PATH
+from typing import Optional, Dict, Iterable, List, Tuple
+from config import DB_PATH, FINGERPRINT_ALGO
 
-
-def db():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute(
-        """
+SCHEMA = [
+    """
     CREATE TABLE IF NOT EXISTS card_map(
       ocr_name TEXT PRIMARY KEY, name TEXT, scryfall_id TEXT, uri TEXT, set_code TEXT, ts INT
-    )"""
-    )
-    conn.execute(
-        """
+    )""",
+    """
     CREATE TABLE IF NOT EXISTS art_map(
       ahash TEXT PRIMARY KEY, name TEXT, scryfall_id TEXT, uri TEXT, ts INT
-    )"""
-    )
-    conn.execute(
-        """
+    )""",
+    """
     CREATE TABLE IF NOT EXISTS collection(
       name TEXT PRIMARY KEY, count INT, scryfall_id TEXT, uri TEXT, ts INT
-    )"""
-    )
+    )""",
+    """
+    CREATE TABLE IF NOT EXISTS page_map(
+      sig TEXT PRIMARY KEY, tiles TEXT, ts INT
+    )""",
+    """
+    CREATE TABLE IF NOT EXISTS tile_map(
+      sig TEXT PRIMARY KEY, name TEXT, scryfall_id TEXT, uri TEXT, set_code TEXT, owned INT, ts INT
+    )""",
+    """
+    CREATE TABLE IF NOT EXISTS scan_run(
+      id INTEGER PRIMARY KEY AUTOINCREMENT, started INT, finished INT, note TEXT
+    )""",
+    # One row per card whose count changed in a run; prev is the count before it.
+    """
+    CREATE TABLE IF NOT EXISTS collection_delta(
+      run INT, name TEXT, count INT, prev INT, ts INT, PRIMARY KEY(run, name)
+    )""",
+    "CREATE INDEX IF NOT EXISTS collection_delta_name ON collection_delta(name, run)",
+    "CREATE INDEX IF NOT EXISTS scan_run_started ON scan_run(started)",
+    """
+    CREATE TABLE IF NOT EXISTS deferred_name(
+      sig TEXT PRIMARY KEY, raw TEXT, ahash TEXT, dhash TEXT, phash TEXT, owned INT, ts INT
+    )""",
+]
+
+CARD_SQL = """INSERT OR REPLACE INTO card_map(ocr_name,name,scryfall_id,uri,set_code,ts)
+              VALUES(?,?,?,?,?,?)"""
+ART_SQL = """INSERT OR REPLACE INTO art_map(ahash,dhash,phash,name,scryfall_id,uri,ts)
+             VALUES(?,?,?,?,?,?,?)"""
+ART_ALGOS = ("ahash", "dhash", "phash")
+COLLECTION_SQL = """INSERT INTO collection(name,count,scryfall_id,uri,ts)
+           VALUES(?,?,?,?,?)
+           ON CONFLICT(name) DO UPDATE SET
+             count=excluded.count,
+             scryfall_id=COALESCE(excluded.scryfall_id, collection.scryfall_id),
+             uri=COALESCE(excluded.uri, collection.uri),
+             ts=excluded.ts"""
+PAGE_SQL = "INSERT OR REPLACE INTO page_map(sig,tiles,ts) VALUES(?,?,?)"
+TILE_SQL = """INSERT OR REPLACE INTO tile_map(sig,name,scryfall_id,uri,set_code,owned,ts)
+              VALUES(?,?,?,?,?,?,?)"""
+DELTA_SQL = """INSERT INTO collection_delta(run,name,count,prev,ts) VALUES(?,?,?,?,?)
+               ON CONFLICT(run,name) DO UPDATE SET count=excluded.count, ts=excluded.ts"""
+DEFERRED_SQL = """INSERT OR REPLACE INTO deferred_name(sig,raw,ahash,dhash,phash,owned,ts)
+                  VALUES(?,?,?,?,?,?,?)"""
+
+# Pending rows are written early if a page somehow queues more than this.
+MAX_PENDING = 512
+
+
+def db(path: Path = DB_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+    # Older caches only have the ahash column.
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(art_map)")}
+    for col in ART_ALGOS:
+        if col not in cols:
+            conn.execute(f"ALTER TABLE art_map ADD COLUMN {col} TEXT")
+    # Caches from before scan history: record the existing collection as a baseline run.
+    if conn.execute("SELECT 1 FROM scan_run LIMIT 1").fetchone() is None:
+        rows = conn.execute("SELECT name,count,ts FROM collection").fetchall()
+        if rows:
+            with conn:
+                run = conn.execute(
+                    "INSERT INTO scan_run(started,finished,note) VALUES(?,?,'baseline')",
+                    (max(r[2] or 0 for r in rows),) * 2,
+                ).lastrowid
+                conn.executemany(DELTA_SQL, [(run, n, c, None, ts) for n, c, ts in rows])
     return conn
 
 
-def cache_card_name(ocr_name: str, info: Dict):
-    conn = db()
-    conn.execute(
-        """INSERT OR REPLACE INTO card_map(ocr_name,name,scryfall_id,uri,set_code,ts)
-                    VALUES(?,?,?,?,?,?)""",
-        (
+class StoreSession:
+    """One long-lived connection; writes are buffered and committed together by flush()."""
+
+    def __init__(self, path: Path = DB_PATH):
+        self.conn = db(path)
+        # WAL already guarantees consistency; NORMAL skips the fsync on every commit.
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self.conn.commit()
+        self._lock = threading.RLock()
+        self._cards: Dict[str, Tuple] = {}
+        self._arts: List[Tuple] = []
+        self._collection: List[Tuple] = []
+        self._pages: List[Tuple] = []
+        self._tiles: List[Tuple] = []
+        self._deferred: List[Tuple] = []
+        self._deltas: List[Tuple] = []
+        self._dirty: set = set()  # collection names changed since take_dirty()
+        # name -> (count, scryfall_id, uri) as stored, loaded on the first upsert
+        self._known: Optional[Dict[str, Tuple]] = None
+        self.run_id: Optional[int] = None
+        self._art_index = None
+        self._legacy_art_index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _pending(self) -> int:
+        return (
+            len(self._cards)
+            + len(self._arts)
+            + len(self._collection)
+            + len(self._pages)
+            + len(self._tiles)
+            + len(self._deferred)
+            + len(self._deltas)
+        )
+
+    def _queued(self):
+        if self._pending() >= MAX_PENDING:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending():
+                return
+            with self.conn:
+                if self._cards:
+                    self.conn.executemany(CARD_SQL, list(self._cards.values()))
+                if self._arts:
+                    self.conn.executemany(ART_SQL, self._arts)
+                if self._collection:
+                    self.conn.executemany(COLLECTION_SQL, self._collection)
+                if self._pages:
+                    self.conn.executemany(PAGE_SQL, self._pages)
+                if self._tiles:
+                    self.conn.executemany(TILE_SQL, self._tiles)
+                if self._deferred:
+                    self.conn.executemany(DEFERRED_SQL, self._deferred)
+                if self._deltas:
+                    self.conn.executemany(DELTA_SQL, self._deltas)
+            self._cards.clear()
+            self._arts.clear()
+            self._collection.clear()
+            self._pages.clear()
+            self._tiles.clear()
+            self._deferred.clear()
+            self._deltas.clear()
+
+    def close(self):
+        with self._lock:
+            self.end_run()  # also closes a run begun implicitly by upsert_collection
+            self.flush()
+            self.conn.close()
+
+    def cache_card_name(self, ocr_name: str, info: Optional[Dict]):
+        info = info or {}
+        row = (
             ocr_name,
             info.get("name"),
             info.get("id"),
             info.get("uri"),
             info.get("set"),
             int(time.time()),
-        ),
-    )
-    conn.commit()
+        )
+        with self._lock:
+            self._cards[ocr_name] = row
+            self._queued()
+
+    def card_map_entry(self, ocr_name: str) -> Optional[Tuple[Optional[Dict], int]]:
+        with self._lock:
+            r = self._cards.get(ocr_name)
+            if r:
+                r = r[1:]
+            else:
+                r = self.conn.execute(
+                    "SELECT name,scryfall_id,uri,set_code,ts FROM card_map WHERE ocr_name=?",
+                    (ocr_name,),
+                ).fetchone()
+        if not r:
+            return None
+        info = {"name": r[0], "id": r[1], "uri": r[2], "set": r[3]} if r[0] else None
+        return info, r[4] or 0
+
+    def cache_art(self, ahash: str, info: Dict, dhash: Optional[str] = None, phash: Optional[str] = None):
+        row = (ahash, dhash, phash, info.get("name"), info.get("id"), info.get("uri"), int(time.time()))
+        with self._lock:
+            self._arts.append(row)
+            if self._art_index is not None:
+                h = {"ahash": ahash, "dhash": dhash, "phash": phash}[FINGERPRINT_ALGO]
+                if h:
+                    self._art_index.add(h, info)
+            self._queued()
+
+    def art_index(self):
+        """In-memory ArtIndex over art_map, loaded once and kept in sync by cache_art."""
+        with self._lock:
+            if self._art_index is None:
+                from artindex import ArtIndex
+
+                self._art_index = ArtIndex(self.iter_art_cache(FINGERPRINT_ALGO))
+            return self._art_index
+
+    def legacy_art_index(self):
+        """ArtIndex by ahash over art_map rows stored before FINGERPRINT_ALGO was recorded.
+
+        Such rows cannot be rehashed without the original art; None when the
+        configured algorithm is ahash itself."""
+        if FINGERPRINT_ALGO == "ahash":
+            return None
+        with self._lock:
+            if self._legacy_art_index is None:
+                from artindex import ArtIndex
+
+                self.flush()
+                self._legacy_art_index = ArtIndex(
+                    self.conn.execute(
+                        f"SELECT ahash,name,scryfall_id,uri FROM art_map "
+                        f"WHERE {FINGERPRINT_ALGO} IS NULL AND ahash IS NOT NULL"
+                    ).fetchall()
+                )
+            return self._legacy_art_index
+
+    def iter_art_cache(self, algo: str = "ahash"):
+        if algo not in ART_ALGOS:
+            raise ValueError(f"unknown fingerprint algorithm: {algo}")
+        with self._lock:
+            self.flush()
+            return self.conn.execute(
+                f"SELECT {algo},name,scryfall_id,uri FROM art_map WHERE {algo} IS NOT NULL"
+            ).fetchall()
+
+    def upsert_collection(self, name: str, count: int, info: Optional[Dict]):
+        """Store a card's count; unchanged rows are skipped and count changes become deltas."""
+        sid = info.get("id") if info else None
+        uri = info.get("uri") if info else None
+        now = int(time.time())
+        with self._lock:
+            if self._known is None:
+                self._known = {
+                    r[0]: tuple(r[1:])
+                    for r in self.conn.execute("SELECT name,count,scryfall_id,uri FROM collection")
+                }
+            prev = self._known.get(name)
+            if prev:
+                if prev[0] == count and sid in (None, prev[1]) and uri in (None, prev[2]):
+                    return
+                sid, uri = sid or prev[1], uri or prev[2]
+            self._known[name] = (count, sid, uri)
+            self._collection.append((name, count, sid, uri, now))
+            self._dirty.add(name)
+            if prev is None or prev[0] != count:
+                self._deltas.append((self.begin_run(), name, count, prev[0] if prev else None, now))
+            self._queued()
+
+    def begin_run(self, note: Optional[str] = None) -> int:
+        """Id of the current scan run, starting one if needed.
+
+        upsert_collection starts one implicitly; close() finishes whichever is open."""
+        with self._lock:
+            if self.run_id is None:
+                with self.conn:
+                    cur = self.conn.execute(
+                        "INSERT INTO scan_run(started,note) VALUES(?,?)", (int(time.time()), note)
+                    )
+                self.run_id = cur.lastrowid
+            return self.run_id
+
+    def end_run(self):
+        with self._lock:
+            if self.run_id is None:
+                return
+            self.flush()
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE scan_run SET finished=? WHERE id=?", (int(time.time()), self.run_id)
+                )
+            self.run_id = None
+
+    def runs(self) -> List[Tuple]:
+        """(id, started, finished, note, changes) for every scan run, oldest first."""
+        with self._lock:
+            self.flush()
+            return self.conn.execute(
+                "SELECT r.id,r.started,r.finished,r.note,"
+                "(SELECT COUNT(*) FROM collection_delta d WHERE d.run=r.id) "
+                "FROM scan_run r ORDER BY r.id"
+            ).fetchall()
+
+    def diff_runs(self, a: int, b: int) -> List[Tuple[str, Optional[int], int]]:
+        """(name, count after run a, count after run b) for cards that differ between them.
+
+        Only the deltas recorded by runs a+1..b are read."""
+        with self._lock:
+            self.flush()
+            rows = self.conn.execute(
+                "SELECT name,count,prev FROM collection_delta WHERE run>? AND run<=? ORDER BY run",
+                (a, b),
+            ).fetchall()
+        first: Dict[str, Optional[int]] = {}
+        last: Dict[str, int] = {}
+        for name, count, prev in rows:
+            first.setdefault(name, prev)
+            last[name] = count
+        return sorted(
+            ((n, first[n], c) for n, c in last.items() if first[n] != c), key=lambda r: r[0].lower()
+        )
+
+    def collection_as_of(self, ts: float) -> List[Tuple[str, int]]:
+        """(name, count) as left by the last run started at or before `ts`."""
+        with self._lock:
+            self.flush()
+            run = self.conn.execute(
+                "SELECT MAX(id) FROM scan_run WHERE started<=?", (int(ts),)
+            ).fetchone()[0]
+            if run is None:
+                return []
+            # SQLite takes the bare `count` from the row holding MAX(run).
+            rows = self.conn.execute(
+                "SELECT name,count,MAX(run) FROM collection_delta WHERE run<=? GROUP BY name",
+                (run,),
+            ).fetchall()
+        return sorted(((r[0], r[1]) for r in rows), key=lambda r: r[0].lower())
+
+    def tile_results(self, sigs: Iterable[str]) -> Dict[str, Tuple[Dict, int]]:
+        """Stored (info, owned) for the given tile signatures that have a result."""
+        sigs = list(sigs)
+        if not sigs:
+            return {}
+        with self._lock:
+            self.flush()
+            rows = self.conn.execute(
+                "SELECT sig,name,scryfall_id,uri,set_code,owned FROM tile_map "
+                f"WHERE sig IN ({','.join('?' * len(sigs))})",
+                sigs,
+            ).fetchall()
+        return {
+            r[0]: ({"name": r[1], "id": r[2], "uri": r[3], "set": r[4]}, r[5]) for r in rows
+        }
+
+    def page_results(self, page_sig: str) -> Dict[str, Tuple[Dict, int]]:
+        """Results for every tile of a stored page, or {} if the page is unknown or partial."""
+        with self._lock:
+            self.flush()
+            r = self.conn.execute("SELECT tiles FROM page_map WHERE sig=?", (page_sig,)).fetchone()
+        if not r:
+            return {}
+        sigs = json.loads(r[0])
+        known = self.tile_results(sigs)
+        return known if len(known) == len(set(sigs)) else {}
+
+    def remember_page(self, page_sig: str, tile_sigs: List[str], results):
+        with self._lock:
+            self._pages.append((page_sig, json.dumps(tile_sigs), int(time.time())))
+            self.remember_tiles(tile_sigs, results)
+
+    def remember_tiles(self, tile_sigs: List[str], results):
+        now = int(time.time())
+        with self._lock:
+            for sig, (info, owned) in zip(tile_sigs, results):
+                if info and info.get("name"):
+                    self._tiles.append(
+                        (sig, info["name"], info.get("id"), info.get("uri"), info.get("set"), owned, now)
+                    )
+            self._queued()
+
+    def defer_name(self, sig: str, raw: str, fp: Dict[str, str], owned: int):
+        """Queue a tile's OCR title for resolve_deferred instead of looking it up now."""
+        row = (sig, raw, fp.get("ahash"), fp.get("dhash"), fp.get("phash"), owned, int(time.time()))
+        with self._lock:
+            self._deferred.append(row)
+            self._queued()
+
+    def deferred_names(self) -> List[Tuple]:
+        """(sig, raw, ahash, dhash, phash, owned) for every queued tile, oldest first."""
+        with self._lock:
+            self.flush()
+            return self.conn.execute(
+                "SELECT sig,raw,ahash,dhash,phash,owned FROM deferred_name ORDER BY ts"
+            ).fetchall()
+
+    def clear_deferred(self, sigs: Iterable[str]):
+        with self._lock:
+            self.flush()
+            with self.conn:
+                self.conn.executemany("DELETE FROM deferred_name WHERE sig=?", [(s,) for s in sigs])
+
+    def collection_rows(self, names: Optional[Iterable[str]] = None) -> List[Tuple]:
+        """(name, count, scryfall_id, uri) rows, all of them or just `names`."""
+        with self._lock:
+            self.flush()
+            if names is None:
+                return self.conn.execute(
+                    "SELECT name,count,scryfall_id,uri FROM collection ORDER BY name COLLATE NOCASE"
+                ).fetchall()
+            names = list(names)
+            rows = []
+            for lo in range(0, len(names), 500):
+                chunk = names[lo : lo + 500]
+                rows += self.conn.execute(
+                    "SELECT name,count,scryfall_id,uri FROM collection "
+                    f"WHERE name IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+            return rows
+
+    def table_counts(self) -> Dict[str, int]:
+        with self._lock:
+            self.flush()
+            tables = self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+                "ORDER BY name"
+            ).fetchall()
+            out = {
+                t: self.conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for (t,) in tables
+            }
+            out["card_map.negative"] = self.conn.execute(
+                "SELECT COUNT(*) FROM card_map WHERE name IS NULL"
+            ).fetchone()[0]
+            out["collection.copies"] = self.conn.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM collection"
+            ).fetchone()[0]
+            return out
+
+    def purge_negative_names(self) -> int:
+        """Forget rejected OCR strings so they are looked up again."""
+        with self._lock:
+            self.flush()
+            with self.conn:
+                return self.conn.execute("DELETE FROM card_map WHERE name IS NULL").rowcount
+
+    def take_dirty(self) -> set:
+        """Collection names upserted since the previous call."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return dirty
+
+
+_session: Optional[StoreSession] = None
+_session_lock = threading.Lock()
+
+
+def session() -> StoreSession:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = StoreSession()
+        return _session
+
+
+def open_session(path: Path = DB_PATH) -> StoreSession:
+    """Replace the process-wide session with one on `path`."""
+    global _session
+    close_session()
+    with _session_lock:
+        _session = StoreSession(path)
+        return _session
+
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def flush():
+    if _session is not None:
+        _session.flush()
+
+
+def cache_card_name(ocr_name: str, info: Optional[Dict]):
+    """Remember an OCR string's card; info=None records a negative entry."""
+    session().cache_card_name(ocr_name, info)
 
 
 def lookup_card_by_ocr(ocr_name: str) -> Optional[Dict]:
-    conn = db()
-    cur = conn.execute("SELECT name,scryfall_id,uri FROM card_map WHERE ocr_name=?", (ocr_name,))
-    r = cur.fetchone()
-    return {"name": r[0], "id": r[1], "uri": r[2]} if r else None
+    entry = session().card_map_entry(ocr_name)
+    return entry[0] if entry else None
+
+
+def card_map_entry(ocr_name: str) -> Optional[Tuple[Optional[Dict], int]]:
+    """Return (info, ts) for a cached OCR string; info is None for negative entries."""
+    return session().card_map_entry(ocr_name)
+
+
+def cache_art(ahash: str, info: Dict, dhash: Optional[str] = None, phash: Optional[str] = None):
+    session().cache_art(ahash, info, dhash, phash)
+
 
+def iter_art_cache(algo: str = "ahash"):
+    return session().iter_art_cache(algo)
 
-def cache_art(ahash: str, info: Dict):
-    conn = db()
-    conn.execute(
-        """INSERT OR REPLACE INTO art_map(ahash,name,scryfall_id,uri,ts)
-                    VALUES(?,?,?,?,?)""",
-        (ahash, info.get("name"), info.get("id"), info.get("uri"), int(time.time())),
-    )
-    conn.commit()
 
+def art_index():
+    return session().art_index()
 
-def iter_art_cache():
-    conn = db()
-    return conn.execute("SELECT ahash,name,scryfall_id,uri FROM art_map").fetchall()
+
+def legacy_art_index():
+    return session().legacy_art_index()
 
 
 def upsert_collection(name: str, count: int, info: Optional[Dict]):
-    conn = db()
-    sid = info.get("id") if info else None
-    uri = info.get("uri") if info else None
-    conn.execute(
-        """INSERT INTO collection(name,count,scryfall_id,uri,ts)
-           VALUES(?,?,?,?,?)
-           ON CONFLICT(name) DO UPDATE SET
-             count=excluded.count,
-             scryfall_id=COALESCE(excluded.scryfall_id, collection.scryfall_id),
-             uri=COALESCE(excluded.uri, collection.uri),
-             ts=excluded.ts""",
-        (name, count, sid, uri, int(time.time())),
-    )
-    conn.commit()
-
-
-def export_csv():
-    conn = db()
-    rows = conn.execute(
-        "SELECT name,count,scryfall_id,uri FROM collection ORDER BY name COLLATE NOCASE"
-    ).fetchall()
-    CSV_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(CSV_PATH, "w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["Card Name", "Owned Copies", "Scryfall ID", "Scryfall URI"])
-        for r in rows:
-            w.writerow(r)
+    session().upsert_collection(name, count, info)
+
+
+def page_results(page_sig: str) -> Dict[str, Tuple[Dict, int]]:
+    return session().page_results(page_sig)
+
+
+def tile_results(sigs: Iterable[str]) -> Dict[str, Tuple[Dict, int]]:
+    return session().tile_results(sigs)
+
+
+def remember_page(page_sig: str, tile_sigs: List[str], results):
+    session().remember_page(page_sig, tile_sigs, results)
+
+
+def remember_tiles(tile_sigs: List[str], results):
+    session().remember_tiles(tile_sigs, results)
+
+
+def defer_name(sig: str, raw: str, fp: Dict[str, str], owned: int):
+    session().defer_name(sig, raw, fp, owned)
+
+
+def deferred_names() -> List[Tuple]:
+    return session().deferred_names()
+
+
+def clear_deferred(sigs: Iterable[str]):
+    session().clear_deferred(sigs)
+
+
+def collection_rows(names: Optional[Iterable[str]] = None) -> List[Tuple]:
+    return session().collection_rows(names)
+
+
+def table_counts() -> Dict[str, int]:
+    return session().table_counts()
+
+
+def purge_negative_names() -> int:
+    return session().purge_negative_names()
+
+
+def begin_run(note: Optional[str] = None) -> int:
+    return session().begin_run(note)
+
+
+def end_run():
+    if _session is not None:
+        _session.end_run()
+
+
+def runs() -> List[Tuple]:
+    return session().runs()
+
+
+def diff_runs(a: int, b: int) -> List[Tuple[str, Optional[int], int]]:
+    return session().diff_runs(a, b)
+
+
+def collection_as_of(ts: float) -> List[Tuple[str, int]]:
+    return session().collection_as_of(ts)
+
+
+def take_dirty() -> set:
+    return session().take_dirty()
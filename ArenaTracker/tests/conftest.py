@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The modules are flat scripts run from the ArenaTracker directory.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
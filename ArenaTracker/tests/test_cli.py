@@ -0,0 +1,65 @@
+import json, os, subprocess, sys
+from pathlib import Path
+
+import pytest
+
+APP_DIR = Path(__file__).resolve().parent.parent
+HEAVY = ("cv2", "numpy", "mss", "pyautogui", "pytesseract", "rapidfuzz", "requests")
+BUDGET_SEC = 0.1
+
+# Imports the CLI, runs one command, then reports its wall time and any heavy modules loaded.
+DRIVER = """
+import json, sys, time
+t0 = time.perf_counter()
+import cli
+cli.main(sys.argv[1:])
+elapsed = time.perf_counter() - t0
+heavy = sorted(m for m in %r if m in sys.modules)
+print("@@" + json.dumps({"elapsed": elapsed, "heavy": heavy}))
+""" % (HEAVY,)
+
+
+def run_cli(home: Path, *argv):
+    env = dict(os.environ, HOME=str(home), USERPROFILE=str(home))
+    out = subprocess.run(
+        [sys.executable, "-c", DRIVER, *argv],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    report = [line for line in out.splitlines() if line.startswith("@@")][-1]
+    return json.loads(report[2:])
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["stats"],
+        ["query", "bolt"],
+        ["query", "--runs"],
+        ["export", "--format", "csv,jsonl,arena"],
+        ["cache", "info"],
+        ["cache", "resolve"],
+    ],
+)
+def test_non_scan_commands_start_fast_without_heavy_imports(tmp_path, argv):
+    run_cli(tmp_path, "stats")  # create the cache DB so timing covers only the command
+    report = run_cli(tmp_path, *argv)
+    assert report["heavy"] == []
+    assert report["elapsed"] < BUDGET_SEC, f"{' '.join(argv)} took {report['elapsed'] * 1000:.0f} ms"
+
+
+def test_unknown_export_format_is_a_usage_error(tmp_path):
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+    res = subprocess.run(
+        [sys.executable, "cli.py", "export", "--format", "csv,pdf"],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert res.returncode == 2
+    assert "unknown format pdf" in res.stderr
+    assert "Traceback" not in res.stderr
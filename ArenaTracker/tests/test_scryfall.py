@@ -0,0 +1,132 @@
+import json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from scryfall import COLLECTION_MAX, CircuitBreaker, ScryfallClient, ScryfallUnavailable
+
+
+class StubScryfall:
+    """Local stand-in for the API: replies are scripted per path, requests are recorded."""
+
+    def __init__(self):
+        self.replies = {}  # path -> list of (status, headers, body); the last one repeats
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self):
+                path = self.path.split("?")[0]
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                stub.requests.append((self.command, path, body))
+                script = stub.replies[path]
+                status, headers, payload = script.pop(0) if len(script) > 1 else script[0]
+                if callable(payload):
+                    payload = payload(body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    s = StubScryfall()
+    yield s
+    s.close()
+
+
+def make_client(stub, failures=3, cooldown=60.0):
+    return ScryfallClient(stub.url, rate=1000, timeout=2, breaker=CircuitBreaker(failures, cooldown))
+
+
+CARD = {"name": "Lightning Bolt", "id": "bolt-id", "scryfall_uri": "https://x/bolt", "set": "lea"}
+
+
+def test_429_backs_off_for_retry_after(stub):
+    stub.replies["/cards/named"] = [(429, {"Retry-After": "0.3"}, {}), (200, {}, CARD)]
+    c = make_client(stub)
+    with pytest.raises(ScryfallUnavailable):
+        c.named("bolt")
+    t0 = time.monotonic()
+    assert c.named("bolt")["id"] == "bolt-id"
+    assert time.monotonic() - t0 >= 0.25
+    c.close()
+
+
+def test_503_opens_breaker_and_fails_fast(stub):
+    stub.replies["/cards/named"] = [(503, {}, {})]
+    c = make_client(stub, failures=2)
+    for _ in range(2):
+        with pytest.raises(ScryfallUnavailable):
+            c.named("bolt")
+    with pytest.raises(ScryfallUnavailable, match="circuit open"):
+        c.named("bolt")
+    assert len(stub.requests) == 2
+    c.close()
+
+
+def test_breaker_lets_a_trial_through_after_cooldown(stub):
+    stub.replies["/cards/named"] = [(503, {}, {}), (200, {}, CARD)]
+    c = make_client(stub, failures=1, cooldown=0.2)
+    with pytest.raises(ScryfallUnavailable):
+        c.named("bolt")
+    with pytest.raises(ScryfallUnavailable, match="circuit open"):
+        c.named("bolt")
+    time.sleep(0.25)
+    assert c.named("bolt")["name"] == "Lightning Bolt"
+    assert c.named("bolt")["name"] == "Lightning Bolt"
+    c.close()
+
+
+def test_named_rejection_is_not_a_failure(stub):
+    stub.replies["/cards/named"] = [(404, {}, {"object": "error"})]
+    c = make_client(stub, failures=1)
+    assert c.named("zzz") is None
+    assert c.named("zzz") is None
+    assert len(stub.requests) == 2
+    c.close()
+
+
+def _collection_reply(body):
+    data, not_found = [], []
+    for ident in body["identifiers"]:
+        n = ident["name"]
+        if n.startswith("missing"):
+            not_found.append(ident)
+        else:
+            data.append({"name": n.title(), "id": f"id-{n}", "scryfall_uri": None, "set": "syn"})
+    return {"object": "list", "not_found": not_found, "data": data}
+
+
+def test_collection_batches_and_skips_not_found(stub):
+    stub.replies["/cards/collection"] = [(200, {}, _collection_reply)]
+    names = [f"card {i}" for i in range(COLLECTION_MAX + 3)] + ["missing one", "Card 0", "missing two"]
+    c = make_client(stub)
+    found = c.collection(names)
+    posts = [r for r in stub.requests if r[:2] == ("POST", "/cards/collection")]
+    assert [len(r[2]["identifiers"]) for r in posts] == [COLLECTION_MAX, 5]
+    assert set(found) == set(names) - {"missing one", "missing two"}
+    assert found["Card 0"] == found["card 0"]
+    assert found["card 7"]["id"] == "id-card 7"
+    c.close()
@@ -0,0 +1,105 @@
+import json, math, threading, time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Sequence
+from config import TRACE_PATH, TRACE_ENABLED
+
+FLUSH_EVERY = 512  # spans buffered before they are appended to the trace file
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    """n, p50, p95 and max (nearest rank) of durations in seconds, reported in ms."""
+    if not values:
+        return {"n": 0}
+    a = sorted(values)
+    rank = lambda q: a[max(0, math.ceil(q * len(a)) - 1)]
+    return {
+        "n": len(a),
+        "p50_ms": round(rank(0.50) * 1000, 3),
+        "p95_ms": round(rank(0.95) * 1000, 3),
+        "max_ms": round(a[-1] * 1000, 3),
+    }
+
+
+class Tracer:
+    """Timing spans, buffered and written as JSON Lines; keeps per-stage durations."""
+
+    def __init__(self, path: Path = TRACE_PATH, enabled: bool = TRACE_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self._buf: List[str] = []
+        self._durations: Dict[str, List[float]] = defaultdict(list)
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0, **attrs)
+
+    def record(self, name: str, seconds: float, **attrs):
+        if not self.enabled:
+            return
+        ev = {"ts": round(time.time(), 4), "span": name, "ms": round(seconds * 1000, 3)}
+        ev["thread"] = threading.current_thread().name
+        if attrs:
+            ev.update(attrs)
+        line = json.dumps(ev)
+        with self._lock:
+            self._durations[name].append(seconds)
+            self._buf.append(line)
+            full = len(self._buf) >= FLUSH_EVERY
+        if full:
+            self.flush()
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] += n
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def flush(self):
+        with self._lock:
+            lines, self._buf = self._buf, []
+        if not lines:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            items = {k: list(v) for k, v in self._durations.items()}
+        return {k: percentiles(v) for k, v in sorted(items.items())}
+
+    def reset(self):
+        with self._lock:
+            self._buf.clear()
+            self._durations.clear()
+            self._counters.clear()
+
+
+tracer = Tracer()
+span = tracer.span
+count = tracer.count
+
+
+def summary_lines() -> List[str]:
+    rows = tracer.summary()
+    if not rows:
+        return []
+    out = [f"{'stage':<22}{'n':>7}{'p50 ms':>11}{'p95 ms':>11}{'max ms':>11}"]
+    for name, st in rows.items():
+        out.append(
+            f"{name:<22}{st['n']:>7}{st['p50_ms']:>11.2f}{st['p95_ms']:>11.2f}{st['max_ms']:>11.2f}"
+        )
+    return out